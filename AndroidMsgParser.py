@@ -8,44 +8,91 @@ April 14, 2024
 
 import os
 from datetime import datetime
-from java import io
-from java.lang import System
-from java.lang import Class
-from java.util.logging import Level
-from java.sql import DriverManager
-from org.sleuthkit.autopsy.datamodel import ContentUtils
+try:
+    from java import io
+    from java.lang import System
+    from java.lang import Class
+    from java.util.logging import Level
+    from java.sql import DriverManager
+    from org.sleuthkit.autopsy.datamodel import ContentUtils
+except ImportError:
+    # running outside Autopsy (see HeadlessRunner.py), the same JDBC calls are backed by sqlite3
+    from SqliteJdbc import Class
+    from SqliteJdbc import DriverManager
+    from Standalone import Level
 from util import Contact
 from util import Message
 from util import Conversation
+from util import ColumnarConversation
+
+
+
+"""SQL expression of column without the characters normalizeIdentifier strips from phone numbers, in lower case: the
+same for every form of a number, and for identifiers normalizeIdentifier tells apart only in rare cases (which
+MmssmsParser.iterConversations then splits again)"""
+def _identifierKeySql(column):
+    expression = column
+    for c in ("' '", "'('", "')'", "'.'", "'-'", "char(9)", "char(10)", "char(13)"):
+        expression = "replace(%s, %s, '')" % (expression, c)
+    return "lower(%s)" % expression
 
 
 
 class MmssmsParser():
     # global variables
     custom_header = "Text Messages (mmssms.db)"         # custom header to display on conversation output
+    version = 2                                         # bump whenever the conversations parsed change (invalidates the parse cache)
     contact_dbName = "contacts2.db"                     # name of db where contacts can be found to conduct contact matching
     contactTable = None                                 # contact table thatwill be used
+    # every message grouped into threads, one per number however it is formatted (addresses that differ only by the
+    # formatting normalizeIdentifier strips, or by case, are one thread), the threads in the order their first address
+    # first appears in the table (as SELECT DISTINCT lists addresses) and the messages of each by date ('date' instead
+    # of 'date_sent' since it seems more reliable, (although what if message didnt send)?).  The key is worked out once
+    # per distinct address, and CROSS JOIN keeps sms the outer loop so each row looks its thread up in an index of the
+    # (small) address table instead of sms being scanned once per address.
+    messageQuery = """
+        WITH addresses AS (
+                SELECT address, %s AS key, MIN(rowid) AS first
+                    FROM sms
+                    WHERE address IS NOT NULL
+                    GROUP BY address),
+            threads AS (
+                SELECT a.address AS address, MIN(b.first) AS thread
+                    FROM addresses AS a
+                    JOIN addresses AS b ON a.key = b.key
+                    GROUP BY a.address)
+        SELECT sms.address, type, date, body, threads.thread
+            FROM sms
+            CROSS JOIN threads ON sms.address = threads.address
+            ORDER BY threads.thread, date""" % _identifierKeySql("address")
     
 
     def __init__(self, parentModule, assignedCase, dataSource):        
         self.parentModule = parentModule            # should be the ConversationExtractorModule object that called this function
         self.assignedCase = assignedCase            # should be the case object this parser is running in
         self.parentDataSource = dataSource          # should be the data source in which the file the parser is analyzing was found
+        # kind of Conversation to build, see ConversationExtractorModule.columnarConversations
+        self.conversationType = ColumnarConversation if parentModule.columnarConversations else Conversation
+        self.contacts = parentModule.getContactRegistry(dataSource)     # shared with the other parsers of the data source
         
 
     """Connect log with log of the parent module"""
-    def log(self, level, msg):
-        self.parentModule.log(level, msg)
+    def log(self, level, msg, *args):
+        self.parentModule.log(level, msg, *args)
+
+    """Connect sampled (per-row) log with log of the parent module"""
+    def logSampled(self, level, msg, *args):
+        self.parentModule.logSampled(level, msg, *args)
 
 
     """Parses text message database of Android phones, which should be located in mmssms.db.  Accepts path to file,
-    and returns a list of Conversation objects."""
-    def parse(self, db_path):
-        conversations = []
+    and yields each Conversation as soon as the cursor moves past its last message, so only the conversation being
+    built is held in memory."""
+    def iterParse(self, db_path):
         self.log(Level.INFO, "Starting MmssmsParser --")
 
         #-- TODO: Find number of device owner
-        deviceOwner = Contact(id="this_device")
+        deviceOwner = self.contacts.get("this_device")
 
         #-- Initalize db connection
         try:
@@ -53,45 +100,57 @@ class MmssmsParser():
             conn = DriverManager.getConnection("jdbc:sqlite:%s"  % db_path)
         except Exception as e:
             self.log(Level.SEVERE, "Unable to establish connection to %s\n\t%s" %(db_path, e))
-            return None
-
-        #-- Find list of unique numbers in message, then for each message extract conversation between it and primary contacct 
-        # find unique numbers                
+            return
+        try:
+            for conversation in self.iterConversations(conn, db_path, deviceOwner):
+                yield conversation
+        finally:
+            conn.close()        # also when the consumer stops early
+
+
+    """Generator of the conversations read through conn, see iterParse"""
+    def iterConversations(self, conn, db_path, deviceOwner):
+        #-- Scan every message once, grouped into threads by number, and split the cursor into conversations each time
+        #   the thread changes (one query instead of one per distinct number).  The rows of a thread are one
+        #   conversation per Contact the registry gives for their addresses, so every form of a number is one
+        #   conversation, ordered by date.
         try:
             statement = conn.createStatement()
-            resultSet = statement.executeQuery("""
-                SELECT DISTINCT address 
-                    FROM sms""")
-            numbersList = []   
-            while resultSet.next() != False:
-                numbersList.append(resultSet.getString("address"))
+            resultSet = statement.executeQuery(self.messageQuery)
         except Exception as e:
-            self.log(Level.WARNING, "Unable to query numbers from %s\n\t%s" % (db_path, e))
-            return None
-        
-        # find conversations related to this number and the primary contact
-        for number in numbersList:
-            # create new contact & conversation for this number
-            newContact = Contact(id=number)  #, name=self.contactMatching(number))   #TODO: contact identification
-            newConversation = Conversation(deviceOwner, newContact)
-
-            # find all messages related to these two participants
-            try:
-                query = """SELECT * 
-                    FROM sms 
-                    WHERE address = ?
-                    ORDER BY date"""                       # using 'date' instead of 'date_sent' since it seems more reliable, (although what if message didnt send)?
-                statement = conn.prepareStatement(query)
-                statement.setString(1, str(number))
-                resultSet = statement.executeQuery()
-            except Exception as e:
-                # log error and move to next iteration
-                self.log(Level.INFO, "Unable to query messages between this device and %s from %s\n\t%s" % (number, db_path, e))
-                continue
-
-            # parse throught found messages and extract useful data
-            try:
-                while resultSet.next() != False:
+            self.log(Level.WARNING, "Unable to query messages from %s\n\t%s" % (db_path, e))
+            return
+
+        # parse throught found messages and extract useful data
+        currentThread = None
+        threadConversations = []        # conversations of the current thread, in the order their contacts appeared
+        byContact = {}                  # Contact -> its conversation in the current thread
+        currentNumber = None
+        newContact = None
+        newConversation = None
+        try:
+            while resultSet.next() != False:
+                thread = resultSet.getString('thread')
+                number = resultSet.getString('address')
+                # thread changed, close off the conversations of the previous one
+                if thread != currentThread:
+                    for conversation in threadConversations:
+                        if conversation.length() > 0:
+                            yield conversation
+                    currentThread = thread
+                    threadConversations = []
+                    byContact = {}
+                    currentNumber = None
+                # address changed, carry on with the conversation of its contact (or start one)
+                if newConversation is None or number != currentNumber:
+                    currentNumber = number
+                    newContact = self.contacts.get(number)  #, name=self.contactMatching(number))   #TODO: contact identification
+                    newConversation = byContact.get(newContact)
+                    if newConversation is None:
+                        newConversation = self.conversationType(deviceOwner, newContact)
+                        byContact[newContact] = newConversation
+                        threadConversations.append(newConversation)
+                try:
                     # identify recipients (type 1 indicates incoming message, type 2 indicates outgoig)
                     if resultSet.getString('type') == str(1):
                         sender = newContact
@@ -100,19 +159,25 @@ class MmssmsParser():
                         sender = deviceOwner 
                         receiver = newContact
                     # identify timestamp
-                    timestamp = int(resultSet.getString('date')) / 1000   # mmssms.db uses Unix epoch in milliseconds
-                    utc_time = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+                    timestamp = int(resultSet.getString('date'))   # mmssms.db uses Unix epoch in milliseconds
                     # get content
                     content = resultSet.getString('body')
-                    newMessage = Message(sender, receiver, utc_time, content)
-                    newConversation.addMsg(newMessage)
-                # add conversation when loop is over
-                if newConversation.length() > 0:
-                    conversations.append(newConversation) 
-            except Exception as e:
-                self.log(Level.INFO, "Error with extracting message data from resultSet\n\t%s" % e)
-
-        #-- Return parser results
+                    newConversation.add(sender, receiver, timestamp, content)
+                except Exception as e:
+                    # log error and move to next message
+                    self.logSampled(Level.INFO, "Unable to extract message between this device and %s from %s\n\t%s", number, db_path, e)
+                    continue
+        except Exception as e:
+            self.log(Level.INFO, "Error with extracting message data from resultSet\n\t%s" % e)
+        # add the conversations of the last thread when loop is over
+        for conversation in threadConversations:
+            if conversation.length() > 0:
+                yield conversation
+
+
+    """Returns the conversations of the database at db_path as a list (None if there are none), see iterParse"""
+    def parse(self, db_path):
+        conversations = list(self.iterParse(db_path))
         if conversations != []:
             return conversations
         else:
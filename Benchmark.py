@@ -0,0 +1,595 @@
+"""
+Benchmark suite for the extractor, run headless (see HeadlessRunner.py) over synthetic devices
+(see SyntheticDevice.py) of increasing size.  Each stage of the report is timed separately:
+
+    copy     ContentUtils.writeToFile of the database to the case temp directory
+    query    the parser's message query, every row and column read through the JDBC layer
+    parse    parser.parse (query plus building Contact/Message/Conversation objects)
+    objects  parse minus query
+    layout   convertToTranscript into the report (pages are compressed/written as they end)
+    output   pdf.output, finishing the report file
+    memory   memory held by the parsed conversations (once per device, see measureMemory)
+
+With --scan-rows N, the sms scan MmssmsParser does (one query grouped by address) is also compared on an
+N-row mmssms.db with the one it replaced (SELECT DISTINCT address, then one query per address), both
+reading every row and column through the JDBC layer:
+
+    scan     seconds and queries executed by each (grouped, per-address), and by MmssmsParser.parse
+
+With --pages 1250,2500,5000,10000, the transcripts of the smallest device are drawn over and over into a report
+until it has each number of pages, kept in memory until output and streamed to its file, to check that the time
+per page stays flat as the report grows:
+
+    pages    layout and output seconds for each page count and mode
+
+With --compress-workers 1,2,4,8, a 5,000 page report (--compress-pages) drawn from the smallest device is kept in
+memory and its pages compressed by that many threads (FPDF.set_compression workers), checking every worker count
+gives the same report:
+
+    compress layout and output seconds for each worker count, on the processors the run reports
+
+With --linebreak 100000, that many message bodies are laid out as transcript text (Arial 10, the full page width)
+by the character by character multi_cell that FPDF._breaklines replaced and by multi_cell as it is, checking both
+give the same lines and the same report:
+
+    linebreak  seconds of each, splitting the text into lines only (split) and drawing it into a report (render)
+
+Every measurement is appended as one JSON object per line to the results file, so runs on
+different commits and machines can be compared over time.
+
+    python Benchmark.py [--sizes 1000,10000,100000] [--repeat 3] [--work bench_data] [--results FILE] [--columnar]
+                        [--scan-rows 1000000] [--pages 1250,2500,5000,10000]
+                        [--compress-workers 1,2,4,8] [--compress-pages 5000] [--linebreak 100000]
+"""
+
+
+import gc
+import os
+import re
+import sys
+import json
+import time
+import logging
+import platform
+import argparse
+import subprocess
+
+try:
+    import resource
+except ImportError:
+    resource = None
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from Standalone import io
+from Standalone import ContentUtils
+from Standalone import AbstractFile
+from SqliteJdbc import Connection
+from SqliteJdbc import DriverManager
+from ConversationExtractorModule import ConversationExtractorModule
+from WorkerPool import cpuCount
+from TranscriptRenderer import RenderContext
+from fpdf.fpdf import FPDF
+from fpdf.php import substr
+from fpdf.php import sprintf
+import SyntheticDevice
+
+timer = getattr(time, "perf_counter", time.time)
+
+
+
+class BenchmarkRun():
+    def __init__(self, workDir, resultsPath, repeat, columnar=False):
+        self.workDir = workDir
+        self.resultsPath = resultsPath
+        self.repeat = repeat
+        self.module = ConversationExtractorModule()
+        self.module.columnarConversations = columnar
+        self.info = {
+            "columnar": columnar,
+            "run": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _gitCommit(),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "host": platform.node(),
+            "cpus": cpuCount(),
+        }
+        self.summary = []           # (messages, target, stage, best seconds)
+        self.memory = []            # (messages, target, bytes per parsed message)
+        self.scans = []             # (messages, scan, best seconds, queries)
+        self.pages = []             # (pages, mode, best layout seconds, best output seconds)
+        self.compression = []       # (pages, workers, best layout seconds, best output seconds, same report as 1 worker)
+        self.lineBreaks = []        # (bodies, stage, mode, best seconds, same result as the first mode)
+
+    "Returns the directory of the device for spec, generating it the first time"
+    def device(self, spec):
+        deviceDir = os.path.join(self.workDir, "devices", spec.key())
+        if not os.path.isdir(deviceDir):
+            start = timer()
+            SyntheticDevice.generateDevice(deviceDir, spec)
+            logging.warning("Generated %s in %.1fs", deviceDir, timer() - start)
+        return deviceDir
+
+    "Generates (or reuses) the device for spec, then times every stage on it repeat times"
+    def benchmarkDevice(self, spec):
+        deviceDir = self.device(spec)
+        tempDir = os.path.join(self.workDir, "temp")
+        if not os.path.isdir(tempDir):
+            os.makedirs(tempDir)
+
+        best = {}
+        order = []                  # stages in the order they ran
+        for repeat in range(self.repeat):
+            for target, stage, seconds, counts in self.runOnce(deviceDir, tempDir):
+                self.record(spec, repeat, target, stage, seconds, counts)
+                key = (target, stage)
+                if key not in best:
+                    order.append(key)
+                best[key] = min(best.get(key, seconds), seconds)
+        for target, stage in order:
+            self.summary.append((spec.messages, target, stage, best[(target, stage)]))
+        for target, stage, seconds, counts in self.measureMemory(deviceDir, tempDir):
+            self.record(spec, 0, target, stage, seconds, counts)
+            self.memory.append((spec.messages, target, counts["bytes_per_message"]))
+
+    """Generates (or reuses) the device for spec and times reading its mmssms.db with the grouped scan and the
+    per-address scan (best of repeat), and MmssmsParser.parse once, counting the queries each executes"""
+    def benchmarkScan(self, spec):
+        deviceDir = self.device(spec)
+        db_path = os.path.join(deviceDir, "mmssms.db")
+        msgParser = self.module.getParser("mmssms.db", None, deviceDir)
+        scans = [("grouped", lambda: self.drainQuery(db_path, msgParser.messageQuery)),
+                 ("per-address", lambda: self.drainPerAddress(db_path))]
+        for scan, fn in scans:
+            best = None
+            for repeat in range(self.repeat):
+                before = Connection.queries
+                start = timer()
+                rows = fn()
+                seconds = timer() - start
+                queries = Connection.queries - before
+                self.record(spec, repeat, "mmssms.db", "scan", seconds, {"scan": scan, "rows": rows, "queries": queries})
+                best = seconds if best is None else min(best, seconds)
+            self.scans.append((spec.messages, scan, best, queries))
+        before = Connection.queries
+        start = timer()
+        conversations = msgParser.parse(db_path) or []
+        seconds = timer() - start
+        queries = Connection.queries - before
+        self.record(spec, 0, "mmssms.db", "scan", seconds, {"scan": "parse", "queries": queries,
+                                                            "conversations": len(conversations)})
+        self.scans.append((spec.messages, "parse", seconds, queries))
+
+    "Returns the parser of the mmssms.db of the device for spec and the conversations it parses out of it"
+    def parsedDevice(self, spec):
+        deviceDir = self.device(spec)
+        tempDir = os.path.join(self.workDir, "temp")
+        if not os.path.isdir(tempDir):
+            os.makedirs(tempDir)
+        msgParser = self.module.getParser("mmssms.db", None, deviceDir)
+        return msgParser, msgParser.parse(os.path.join(deviceDir, "mmssms.db")) or []
+
+    "Draws conversations over and over into pdf until it has pages pages"
+    def drawPages(self, pdf, msgParser, conversations, pages):
+        i = 0
+        while pdf.page < pages:
+            self.module.convertToTranscript([conversations[i % len(conversations)]], msgParser.custom_header, pdf)
+            i += 1
+
+    """Parses the mmssms.db of the device for spec, then for each page count draws its conversations over and over
+    into a report until it has that many pages and outputs it, in memory and streamed (best of repeat)"""
+    def benchmarkPages(self, spec, pageCounts):
+        msgParser, conversations = self.parsedDevice(spec)
+        if not conversations:
+            return
+        report_path = os.path.join(self.workDir, "temp", self.module.reportName)
+        for pages in pageCounts:
+            for mode in ("memory", "streamed"):
+                best = None
+                for repeat in range(self.repeat):
+                    pdf = self.module.createReport(report_path, mode == "streamed")
+                    start = timer()
+                    self.drawPages(pdf, msgParser, conversations, pages)
+                    layout = timer() - start
+                    start = timer()
+                    pdf.output(name=report_path)
+                    output = timer() - start
+                    counts = {"mode": mode, "pages": pdf.page, "layout": round(layout, 6), "output": round(output, 6),
+                              "bytes": os.path.getsize(report_path)}
+                    self.record(spec, repeat, "report", "pages", layout + output, counts)
+                    os.remove(report_path)
+                    pdf = None
+                    if best is None:
+                        best = [layout, output]
+                    best = [min(best[0], layout), min(best[1], output)]
+                self.pages.append((pages, mode, best[0], best[1]))
+
+    """Parses the mmssms.db of the device for spec and draws its conversations into a report of pages pages kept in
+    memory, its pages compressed by each number of workers in turn (best of repeat), checking every worker count
+    gives the same report"""
+    def benchmarkCompression(self, spec, pages, workerCounts):
+        msgParser, conversations = self.parsedDevice(spec)
+        if not conversations:
+            return
+        report_path = os.path.join(self.workDir, "temp", self.module.reportName)
+        expected = None
+        for workers in workerCounts:
+            best = None
+            for repeat in range(self.repeat):
+                pdf = self.module.createReport(report_path, False)
+                pdf.set_compression(1, workers)
+                start = timer()
+                self.drawPages(pdf, msgParser, conversations, pages)
+                layout = timer() - start
+                start = timer()
+                pdf.output(name=report_path)
+                output = timer() - start
+                with open(report_path, "rb") as f:
+                    result = re.sub(br"/CreationDate \([^)]*\)", b"", f.read())
+                os.remove(report_path)
+                if expected is None:
+                    expected = result
+                same = result == expected
+                if not same:
+                    logging.error("compression on %d workers: not the same report as on %d", workers, workerCounts[0])
+                counts = {"workers": workers, "pages": pdf.page, "layout": round(layout, 6), "output": round(output, 6),
+                          "same": same}
+                self.record(spec, repeat, "report", "compress", layout + output, counts)
+                result = pdf = None
+                if best is None:
+                    best = [layout, output]
+                best = [min(best[0], layout), min(best[1], output)]
+            self.compression.append((pages, workers, best[0], best[1], same))
+
+    """Draws count message bodies for spec and lays each out as transcript message text with the character by
+    character multi_cell and with FPDF.multi_cell, splitting only and drawing into a report (best of repeat),
+    checking both give the same lines and the same report"""
+    def benchmarkLineBreaks(self, spec, count):
+        ctx = RenderContext(None)
+        bodies = [ctx.encode(body) for body in SyntheticDevice.messageBodies(spec, count)]
+        modes = [("character", _multiCellByCharacter), ("breaklines", FPDF.multi_cell)]
+        for stage in ("split", "render"):
+            expected = None
+            for mode, multiCell in modes:
+                best = None
+                for repeat in range(self.repeat):
+                    pdf = FPDF()
+                    pdf.add_page()
+                    pdf.set_font(*RenderContext.PERSON1_CONTENT[:3])
+                    start = timer()
+                    if stage == "split":
+                        result = [multiCell(pdf, 0, 5, body, split_only=True) for body in bodies]
+                    else:
+                        for body in bodies:
+                            multiCell(pdf, 0, 5, body)
+                    seconds = timer() - start
+                    if stage == "render":
+                        result = pdf.output(dest="S")
+                        if not isinstance(result, bytes):
+                            result = result.encode("latin1")
+                        result = re.sub(br"/CreationDate \([^)]*\)", b"", result)
+                    if expected is None:
+                        expected = result
+                    same = result == expected
+                    if not same:
+                        logging.error("%s %s: not the same result as %s", stage, mode, modes[0][0])
+                    counts = {"mode": mode, "bodies": count, "same": same, "pages": pdf.page}
+                    self.record(spec, repeat, "report", "linebreak", seconds, dict(counts, split_only=stage == "split"))
+                    result = pdf = None
+                    best = seconds if best is None else min(best, seconds)
+                self.lineBreaks.append((count, stage, mode, best, same))
+
+    "Runs the report over a device once, yields (target, stage, seconds, counts) for each stage"
+    def runOnce(self, deviceDir, tempDir):
+        module = self.module
+        report_path = os.path.join(tempDir, module.reportName)
+        pdf = module.createReport(report_path)
+        module.writeDataSourceHeader(os.path.basename(deviceDir), pdf)
+        for target_name in module.targets:
+            source = os.path.join(deviceDir, target_name)
+            if not os.path.exists(source):
+                continue
+            db_path = os.path.join(tempDir, target_name)
+
+            start = timer()
+            ContentUtils.writeToFile(AbstractFile(source), io.File(db_path))
+            yield target_name, "copy", timer() - start, {"bytes": os.path.getsize(db_path)}
+
+            msgParser = module.getParser(target_name, None, deviceDir)
+            start = timer()
+            rows = self.drainQuery(db_path, msgParser.messageQuery)
+            query = timer() - start
+            yield target_name, "query", query, {"rows": rows}
+
+            start = timer()
+            conversations = msgParser.parse(db_path) or []
+            parse = timer() - start
+            messages = sum(c.length() for c in conversations)
+            counts = {"conversations": len(conversations), "messages": messages}
+            yield target_name, "parse", parse, counts
+            yield target_name, "objects", max(0.0, parse - query), counts
+
+            start = timer()
+            module.convertToTranscript(conversations, msgParser.custom_header, pdf)
+            yield target_name, "layout", timer() - start, {"messages": messages, "pages": pdf.page}
+            os.remove(db_path)
+
+        start = timer()
+        pdf.output(name=report_path)
+        counts = {"pages": pdf.page, "bytes": os.path.getsize(report_path)}
+        if resource is not None:
+            counts["peak_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        yield "report", "output", timer() - start, counts
+        os.remove(report_path)
+
+    """Parses each database of a device once more, yields (target, "memory", seconds, counts) with the memory the
+    conversations hold once parsed (bytes, and per message).  Measured with tracemalloc (Python 3), or the JVM heap
+    in use (Jython); nothing is yielded where neither is available.  The parse is slower while traced."""
+    def measureMemory(self, deviceDir, tempDir):
+        for target_name in self.module.targets:
+            source = os.path.join(deviceDir, target_name)
+            if not os.path.exists(source):
+                continue
+            db_path = os.path.join(tempDir, target_name)
+            ContentUtils.writeToFile(AbstractFile(source), io.File(db_path))
+            msgParser = self.module.getParser(target_name, None, deviceDir)
+            tracing = tracemalloc is not None and not tracemalloc.is_tracing()
+            if tracing:
+                tracemalloc.start()
+            try:
+                before = _memoryInUse()
+                start = timer()
+                conversations = msgParser.parse(db_path) or []
+                seconds = timer() - start
+                after = _memoryInUse()
+            finally:
+                if tracing:
+                    tracemalloc.stop()
+            os.remove(db_path)
+            if before is None:
+                return
+            messages = sum(c.length() for c in conversations)
+            used = after - before
+            yield target_name, "memory", seconds, {"messages": messages, "bytes": used,
+                                                   "bytes_per_message": round(used / float(max(1, messages)), 1)}
+            conversations = None
+
+    "Runs query through the JDBC layer the parsers use, reading every column of every row, returns the row count"
+    def drainQuery(self, db_path, query):
+        conn = DriverManager.getConnection("jdbc:sqlite:%s" % db_path)
+        resultSet = conn.createStatement().executeQuery(query)
+        columns = range(1, len(resultSet.columns) + 1)
+        rows = 0
+        while resultSet.next():
+            for column in columns:
+                resultSet.getString(column)
+            rows += 1
+        conn.close()
+        return rows
+
+    """Reads mmssms.db the way MmssmsParser did before its grouped scan: the distinct addresses, then the messages of
+    each through a prepared query (every column of every row read), returns the row count"""
+    def drainPerAddress(self, db_path):
+        conn = DriverManager.getConnection("jdbc:sqlite:%s" % db_path)
+        resultSet = conn.createStatement().executeQuery("SELECT DISTINCT address FROM sms")
+        numbers = []
+        while resultSet.next():
+            numbers.append(resultSet.getString("address"))
+        rows = 0
+        for number in numbers:
+            statement = conn.prepareStatement("SELECT * FROM sms WHERE address = ? ORDER BY date")
+            statement.setString(1, number)
+            resultSet = statement.executeQuery()
+            columns = range(1, len(resultSet.columns) + 1)
+            while resultSet.next():
+                for column in columns:
+                    resultSet.getString(column)
+                rows += 1
+        conn.close()
+        return rows
+
+    def record(self, spec, repeat, target, stage, seconds, counts):
+        result = dict(self.info)
+        result.update({"messages": spec.messages, "spec": spec.asDict(), "repeat": repeat,
+                       "target": target, "stage": stage, "seconds": round(seconds, 6)})
+        result.update(counts)
+        with open(self.resultsPath, "a") as f:
+            f.write(json.dumps(result, sort_keys=True) + "\n")
+
+    "Prints the best time of each stage, per device size"
+    def printSummary(self):
+        print("%10s  %-12s %-8s %10s %14s" % ("messages", "target", "stage", "seconds", "messages/s"))
+        for messages, target, stage, seconds in self.summary:
+            rate = messages / seconds if seconds > 0 and target != "report" else 0
+            print("%10d  %-12s %-8s %10.3f %14s" % (messages, target, stage, seconds, ("%.0f" % rate) if rate else "-"))
+        if self.memory:
+            print("")
+            print("%10s  %-12s %17s" % ("messages", "target", "bytes/message"))
+            for messages, target, perMessage in self.memory:
+                print("%10d  %-12s %17.1f" % (messages, target, perMessage))
+        if self.scans:
+            print("")
+            print("%10s  %-12s %10s %10s" % ("messages", "scan", "seconds", "queries"))
+            for messages, scan, seconds, queries in self.scans:
+                print("%10d  %-12s %10.3f %10d" % (messages, scan, seconds, queries))
+        if self.pages:
+            print("")
+            print("%10s  %-12s %10s %10s %14s" % ("pages", "mode", "layout", "output", "ms/page"))
+            for pages, mode, layout, output in self.pages:
+                print("%10d  %-12s %10.3f %10.3f %14.3f" % (pages, mode, layout, output, 1000 * (layout + output) / pages))
+        if self.compression:
+            print("")
+            print("%10s  %-8s %10s %10s %10s %9s %6s" % ("pages", "workers", "layout", "output", "total", "speedup", "same"))
+            first = None
+            for pages, workers, layout, output, same in self.compression:
+                if first is None:
+                    first = layout + output
+                print("%10d  %-8d %10.3f %10.3f %10.3f %8.2fx %6s" % (pages, workers, layout, output, layout + output,
+                                                                    first / (layout + output), "yes" if same else "NO"))
+            print("processors: %d" % self.info["cpus"])
+        if self.lineBreaks:
+            print("")
+            print("%10s  %-8s %-12s %10s %10s %6s" % ("bodies", "stage", "mode", "seconds", "speedup", "same"))
+            first = {}
+            for bodies, stage, mode, seconds, same in self.lineBreaks:
+                first.setdefault(stage, seconds)
+                speedup = first[stage] / seconds if seconds > 0 else 0
+                print("%10d  %-8s %-12s %10.3f %9.2fx %6s" % (bodies, stage, mode, seconds, speedup, "yes" if same else "NO"))
+
+
+
+"""FPDF.multi_cell as it was before FPDF._breaklines (without borders or fill, which transcripts do not use): adds up
+the width of the text one character at a time and breaks the line at the last space once it is too wide"""
+def _multiCellByCharacter(pdf, w, h, txt='', align='J', split_only=False):
+    txt = pdf.normalize_text(txt)
+    ret = []
+    if w == 0:
+        w = pdf.w - pdf.r_margin - pdf.x
+    wmax = (w - 2 * pdf.c_margin) * 1000.0 / pdf.font_size
+    s = txt.replace("\r", "")
+    if not pdf.unifontsubset:
+        cws = list(pdf._charwidths(s))
+    nb = len(s)
+    if nb > 0 and s[nb - 1] == "\n":
+        nb -= 1
+    sep = -1
+    i = 0
+    j = 0
+    l = 0
+    ns = 0
+    while i < nb:
+        c = s[i]
+        if c == "\n":
+            # explicit line break
+            if pdf.ws > 0:
+                pdf.ws = 0
+                if not split_only:
+                    pdf._putws("0 Tw")
+            if not split_only:
+                pdf.cell(w, h, substr(s, j, i - j), 0, 2, align)
+            else:
+                ret.append(substr(s, j, i - j))
+            i += 1
+            sep = -1
+            j = i
+            l = 0
+            ns = 0
+            continue
+        if c == " ":
+            sep = i
+            ls = l
+            ns += 1
+        if pdf.unifontsubset:
+            l += pdf.get_string_width(c) / pdf.font_size * 1000.0
+        else:
+            l += cws[i]
+        if l > wmax:
+            # automatic line break
+            if sep == -1:
+                if i == j:
+                    i += 1
+                if pdf.ws > 0:
+                    pdf.ws = 0
+                    if not split_only:
+                        pdf._putws("0 Tw")
+                if not split_only:
+                    pdf.cell(w, h, substr(s, j, i - j), 0, 2, align)
+                else:
+                    ret.append(substr(s, j, i - j))
+            else:
+                if align == "J":
+                    if ns > 1:
+                        pdf.ws = (wmax - ls) / 1000.0 * pdf.font_size / (ns - 1)
+                    else:
+                        pdf.ws = 0
+                    if not split_only:
+                        pdf._putws(sprintf("%.3f Tw", pdf.ws * pdf.k))
+                if not split_only:
+                    pdf.cell(w, h, substr(s, j, sep - j), 0, 2, align)
+                else:
+                    ret.append(substr(s, j, sep - j))
+                i = sep + 1
+            sep = -1
+            j = i
+            l = 0
+            ns = 0
+        else:
+            i += 1
+    # last chunk
+    if pdf.ws > 0:
+        pdf.ws = 0
+        if not split_only:
+            pdf._putws("0 Tw")
+    if not split_only:
+        pdf.cell(w, h, substr(s, j, i - j), 0, 2, align)
+        pdf.x = pdf.l_margin
+    else:
+        ret.append(substr(s, j, i - j))
+    return ret
+
+
+"""Bytes of memory in use after a full collection: traced by tracemalloc if it is running, else the JVM heap in use
+when in Jython, else None"""
+def _memoryInUse():
+    gc.collect()
+    if tracemalloc is not None and tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    try:
+        from java.lang import Runtime
+        from java.lang import System
+    except ImportError:
+        return None
+    System.gc()
+    runtime = Runtime.getRuntime()
+    return runtime.totalMemory() - runtime.freeMemory()
+
+
+def _gitCommit():
+    try:
+        out = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                      stderr=open(os.devnull, "w"))
+        return out.decode("ascii").strip()
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time each stage of the conversation report on synthetic devices.")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma separated sms message counts, one device each (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per device, the best is summarised (default: %(default)s)")
+    parser.add_argument("--work", default="bench_data", help="directory for generated devices and temp files (default: %(default)s)")
+    parser.add_argument("--results", help="JSON lines file results are appended to (default: WORK/results.jsonl)")
+    parser.add_argument("--columnar", action="store_true", help="parse into columnar conversations (util.ColumnarConversation)")
+    parser.add_argument("--scan-rows", type=int, help="also compare the grouped sms scan with one query per address on an mmssms.db of this many rows (e.g. 1000000)")
+    parser.add_argument("--pages", help="also time reports of these comma separated page counts, drawn from the smallest device (e.g. 1250,2500,5000,10000)")
+    parser.add_argument("--compress-workers", help="also time a report kept in memory with its pages compressed on each of these comma separated numbers of threads, drawn from the smallest device (e.g. 1,2,4,8)")
+    parser.add_argument("--compress-pages", type=int, default=5000, help="pages of the --compress-workers report (default: %(default)s)")
+    parser.add_argument("--linebreak", type=int, help="also time laying out this many message bodies with the character by character multi_cell and the current one (e.g. 100000)")
+    SyntheticDevice.addSpecArguments(parser)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(message)s")
+    if not os.path.isdir(args.work):
+        os.makedirs(args.work)
+    run = BenchmarkRun(args.work, args.results or os.path.join(args.work, "results.jsonl"), args.repeat, args.columnar)
+    for size in args.sizes.split(","):
+        run.benchmarkDevice(SyntheticDevice.specFromArguments(args, int(size)))
+    if args.pages:
+        sizes = [int(size) for size in args.sizes.split(",")]
+        run.benchmarkPages(SyntheticDevice.specFromArguments(args, min(sizes)), [int(pages) for pages in args.pages.split(",")])
+    if args.scan_rows:
+        run.benchmarkScan(SyntheticDevice.specFromArguments(args, args.scan_rows))
+    if args.compress_workers:
+        sizes = [int(size) for size in args.sizes.split(",")]
+        run.benchmarkCompression(SyntheticDevice.specFromArguments(args, min(sizes)), args.compress_pages,
+                                 [int(workers) for workers in args.compress_workers.split(",")])
+    if args.linebreak:
+        run.benchmarkLineBreaks(SyntheticDevice.specFromArguments(args, args.linebreak), args.linebreak)
+    run.printSummary()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,25 +12,38 @@ free-to-use for modification.
 
 
 import os
-import jarray
-import inspect
+import sys
+import itertools
+import traceback
+import threading
 from datetime import datetime
-from java import io
-from java.lang import System
-from java.lang import Class
-from java.util.logging import Level
-from java.sql import DriverManager
-from org.sleuthkit.autopsy.casemodule import Case
-from org.sleuthkit.autopsy.coreutils import Logger
-from org.sleuthkit.autopsy.report import GeneralReportModuleAdapter
-from org.sleuthkit.autopsy.report.ReportProgressPanel import ReportStatus
-from org.sleuthkit.datamodel import SleuthkitCase
-from org.sleuthkit.datamodel import AbstractFile
-from org.sleuthkit.datamodel import Score
-from org.sleuthkit.datamodel import ReadContentInputStream
-from org.sleuthkit.datamodel import BlackboardArtifact
-from org.sleuthkit.datamodel import BlackboardAttribute
-from org.sleuthkit.autopsy.datamodel import ContentUtils
+try:
+    import jarray
+    from java import io
+    from java.lang import System
+    from java.lang import Class
+    from java.util.logging import Level
+    from java.sql import DriverManager
+    from org.sleuthkit.autopsy.casemodule import Case
+    from org.sleuthkit.autopsy.coreutils import Logger
+    from org.sleuthkit.autopsy.report import GeneralReportModuleAdapter
+    from org.sleuthkit.autopsy.report.ReportProgressPanel import ReportStatus
+    from org.sleuthkit.datamodel import SleuthkitCase
+    from org.sleuthkit.datamodel import AbstractFile
+    from org.sleuthkit.datamodel import Score
+    from org.sleuthkit.datamodel import ReadContentInputStream
+    from org.sleuthkit.datamodel import BlackboardArtifact
+    from org.sleuthkit.datamodel import BlackboardAttribute
+    from org.sleuthkit.autopsy.datamodel import ContentUtils
+except ImportError:
+    # running outside Autopsy (see HeadlessRunner.py), with a case backed by a directory tree
+    from Standalone import io
+    from Standalone import Level
+    from Standalone import Case
+    from Standalone import Logger
+    from Standalone import GeneralReportModuleAdapter
+    from Standalone import ReportStatus
+    from Standalone import ContentUtils
 from fpdf.fpdf import FPDF
 
 # import parsers
@@ -39,6 +52,15 @@ import FacebookParser
 from util import Contact
 from util import Message
 from util import Conversation
+from util import ContactRegistry
+from util import resetTimestampFormat
+from TranscriptRenderer import RenderContext
+from WorkerPool import OrderedWorkerPool
+from WorkerPool import Pipe
+from WorkerPool import cpuCount
+from TempCopyCache import TempCopyCache
+from ParseCache import ParseCache
+from SectionCache import SectionCache
 
 
 
@@ -50,12 +72,65 @@ said conversation"""
 
 class ConversationExtractorModule(GeneralReportModuleAdapter):
     moduleName = "Conversation Identifier & Extractor"
+    reportName = "Extracted Conversations Report.pdf"
+    targets = ["mmssms.db", "threads_db2"]         # target databases to search for in each data source
+    workers = None              # databases found/copied/parsed at once by generateReport, None for the default (getWorkerCount)
+    pipeDepth = 32              # parsed conversations of a database that may wait to be written to the report
+    tempCacheDir = "ConversationExtractor"      # directory under the case temp directory the databases are copied to
+    tempCacheBytes = 4 * 1024 ** 3              # copies kept there between reports, least recently used deleted first
+    parseCacheDir = "ConversationExtractor"     # directory under the case module output directory parse results are saved to
+    sectionCacheDir = os.path.join("ConversationExtractor", "Sections")    # same, for rendered transcripts
+    transcriptVersion = 2       # bump whenever the transcripts drawn change (convertToTranscript, RenderContext styles)
+    columnarConversations = False   # parsers keep messages in columns (util.ColumnarConversation), not one object each
 
     _logger = None
-    def log(self, level, msg):
+    _logSampleCounts = None
+    _contactRegistries = None   # data source -> ContactRegistry, for one report
+    _registryLock = threading.Lock()
+    logSampleRate = 1000        # sampled log messages are only written once every this many calls
+
+    """Returns the module logger, creating it on first use"""
+    def getLogger(self):
         if self._logger == None:
             self._logger = Logger.getLogger(self.moduleName)
-        self._logger.logp(level, self.__class__.__name__, inspect.stack()[1][3], msg)
+        return self._logger
+
+    """Returns True if a message at this level would be written, checked before doing any formatting work"""
+    def isLoggable(self, level):
+        return self.getLogger().isLoggable(level)
+
+    """Logs msg at level.  Extra args are only %-formatted into msg (and the calling function only looked up)
+    if the level is enabled, so disabled log calls cost a single level check."""
+    def log(self, level, msg, *args):
+        logger = self.getLogger()
+        if not logger.isLoggable(level):
+            return
+        if args:
+            msg = msg % args
+        logger.logp(level, self.__class__.__name__, self._callerName(), msg)
+
+    """Same as log, but meant for per-row messages in hot loops: only the first call and then every
+    logSampleRate-th call for a given msg are written, along with how many times it was hit."""
+    def logSampled(self, level, msg, *args):
+        logger = self.getLogger()
+        if not logger.isLoggable(level):
+            return
+        if self._logSampleCounts == None:
+            self._logSampleCounts = {}
+        count = self._logSampleCounts.get(msg, 0) + 1
+        self._logSampleCounts[msg] = count
+        if self.logSampleRate > 1 and count % self.logSampleRate != 1:
+            return
+        if args:
+            msg = msg % args
+        logger.logp(level, self.__class__.__name__, self._callerName(), "%s [sampled, call #%d]" % (msg, count))
+
+    """Name of the function that asked for the log, skipping the log methods (parsers forward theirs to ours)"""
+    def _callerName(self):
+        frame = sys._getframe(2)
+        while frame.f_back is not None and frame.f_code.co_name in ("log", "logSampled"):
+            frame = frame.f_back
+        return frame.f_code.co_name
 
     def getName(self):
         return self.moduleName
@@ -68,11 +143,12 @@ class ConversationExtractorModule(GeneralReportModuleAdapter):
         return "."
 
 
-    """convert messages of conversations from database into a transcript"""
+    """convert messages of conversations from database into a transcript (extractedConversations can be any iterable,
+    each conversation is rendered as it is taken from it)"""
     def convertToTranscript(self, extractedConversations, db_header, pdf):
+        ctx = RenderContext(pdf)        # only switches fonts/colors on the pdf when they change
         # Datas source for following convos (header) 
-        pdf.set_font("Arial", "B", 18)
-        pdf.set_text_color(0,0,0)
+        ctx.setStyle(RenderContext.DB_HEADER)
         pdf.cell(0, 15, db_header, align='C', ln=1)
 
         # Iterate through each conversation
@@ -80,61 +156,240 @@ class ConversationExtractorModule(GeneralReportModuleAdapter):
             try:                                   
                 # write convo header transcript
                 convo_header = ("Conversation: %s to %s" % (convObj.person1.getFullName(), convObj.person2.getFullName()))
-                pdf.set_text_color(0,0,0)
-                pdf.set_font("Arial", "B", 12)
-                pdf.multi_cell(0, 5, convo_header)
+                ctx.setStyle(RenderContext.CONVO_HEADER)
+                pdf.multi_cell(0, 5, ctx.encodeHeader(convo_header))
                 pdf.ln(5)
+                # work out label & colors of each sender once per conversation
+                person1_name = convObj.person1.getNameOrIdentifier()
+                senders = {}
                 # write message transcript
                 messages = convObj.messages
                 previous_sender = None
                 for msgObj in messages:
                     try:
-                        msg_sender = msgObj.sender.getNameOrIdentifier().encode('utf-8').decode('latin-1', errors='ignore')
+                        sender = senders.get(msgObj.sender)
+                        if sender is None:
+                            if msgObj.sender.getNameOrIdentifier() == person1_name:
+                                sender = (ctx.senderLabel(msgObj.sender), RenderContext.PERSON1_SENDER, RenderContext.PERSON1_CONTENT)
+                            else:
+                                sender = (ctx.senderLabel(msgObj.sender), RenderContext.PERSON2_SENDER, RenderContext.PERSON2_CONTENT)
+                            senders[msgObj.sender] = sender
+                        msg_sender, sender_style, content_style = sender
                         # add new sender if needed
                         if previous_sender != msg_sender:
-                            if msg_sender == convObj.person1.getNameOrIdentifier(): 
-                                pdf.set_text_color(r=0,b=100,g=0) # dark blue
-                            else:
-                                pdf.set_text_color(r=100,b=0,g=0) # dark red
-                            pdf.set_font("Arial", "BU", 10)
+                            ctx.setStyle(sender_style)
                             pdf.cell(0, 5, msg_sender, ln=1)
                         # # write content
-                        msg_content = msgObj.content.encode('utf-8').decode('latin-1', errors='ignore')
-                        if msg_sender == convObj.person1.getNameOrIdentifier(): 
-                            pdf.set_text_color(r=0,b=200,g=0) # light blue
-                        else:
-                            pdf.set_text_color(r=200,b=0,g=0) # light red
-                        pdf.set_font("Arial", '', 10)
+                        msg_content = ctx.encode(msgObj.content)
+                        ctx.setStyle(content_style)
                         pdf.multi_cell(0, 5, msg_content)
                         # # add date
-                        msg_date_sent = msgObj.date_sent
-                        pdf.set_text_color(100)  # grey
-                        pdf.set_font("Arial", "I", 10)
-                        pdf.cell(0, 5, msg_date_sent, ln=1)
+                        ctx.setStyle(RenderContext.DATE)
+                        pdf.cell(0, 5, msgObj.date_sent, ln=1)
                         # add some space && update sender
                         pdf.ln(5)
                         previous_sender = msg_sender
                     except Exception as e:
-                        self.log(Level.SEVERE, "Error writing a message to transcript in conversation between %s and %s from %s\n\t%s" % (convObj.person1.getFullName(), convObj.person2.getFullName(), db_header, e))
-                        pdf.set_text_color(0,0,0)
-                        pdf.set_font("Arial", '', 10)
+                        self.logSampled(Level.SEVERE, "Error writing a message to transcript in conversation between %s and %s from %s\n\t%s", convObj.person1.getFullName(), convObj.person2.getFullName(), db_header, e)
+                        ctx.setStyle(RenderContext.ERROR)
                         pdf.cell(0, 10, "--ERROR WRITING MESSAGE--", ln=1)
                         continue
                 # Convo house keeping
                 pdf.ln(10)
             except Exception as e:
                 self.log(Level.SEVERE, "Error writing conversation to transcript in, for conversation between %s and %s from %s\n\t%s" % (convObj.person1.getFullName(), convObj.person2.getFullName(), db_header, e))
-                pdf.set_text_color(0,0,0)
-                pdf.set_font("Arial", "B", 12)
+                ctx.setStyle(RenderContext.CONVO_ERROR)
                 pdf.cell(0, 10, "--ERROR WRITING CONVO HEADER--", ln=1)
     
 
 
+    """Creates the report pdf with its title, written out to report_path as pages are finished (or kept in memory
+    until output, if not streaming)"""
+    def createReport(self, report_path, streaming=True):
+        pdf = FPDF()    # autopage breaking enabled by default at 2cm
+        if streaming:
+            pdf.set_streaming(report_path)  # write finished pages straight to the report file to keep memory flat
+        pdf.set_text_batching(1)            # share one text object between consecutive lines of the same style
+        pdf.add_page()
+        pdf.set_font("Arial", "B", 24)
+        pdf.cell(0, 30, "Extracted Conversations Report", align='C', ln=1)
+        # register every font the report uses now, so the fonts registered (and their numbers in the pdf) are the same
+        # at the start of each database's transcript whatever was drawn before it (see beginTranscript)
+        for style in RenderContext.STYLES:
+            pdf.set_font(*style[:3])
+        return pdf
+
+
+    """Writes the heading of a data source at the top of a new page, the transcripts of the databases found in it
+    follow"""
+    def writeDataSourceHeader(self, ds_name, pdf):
+        pdf.add_fresh_page()
+        pdf.set_font("Arial", "I", 18)
+        pdf.set_text_color(0,0,0)
+        pdf.cell(0, 10, ds_name, ln=1)
+
+
+    """Starts the transcript of a database: right below the data source heading if it is the first one written since
+    (afterHeader), else at the top of a new page.  Either way it starts from a drawing state that does not depend on
+    what was drawn before, so changing, adding or removing a database leaves the sections of the others (see
+    SectionCache) reusable"""
+    def beginTranscript(self, pdf, afterHeader):
+        if not afterHeader:
+            pdf.add_fresh_page()
+
+
+    """Returns the contacts of dataSource, one registry per data source shared by the parsers of all its databases"""
+    def getContactRegistry(self, dataSource):
+        with self._registryLock:
+            if self._contactRegistries == None:
+                self._contactRegistries = {}
+            registry = self._contactRegistries.get(dataSource)
+            if registry == None:
+                registry = ContactRegistry()
+                self._contactRegistries[dataSource] = registry
+            return registry
+
+
+    """Returns the parser to use for a target database, or None if there is none --- ADD PARSERS HERE"""
+    def getParser(self, target_name, assignedCase, dataSource):
+        if target_name == "mmssms.db":
+            self.log(Level.INFO, ("Utilizing AndroidMsgParser for %s" % target_name))
+            return AndroidMsgParser.MmssmsParser(self, assignedCase, dataSource)
+        elif target_name == "threads_db2":
+            self.log(Level.INFO, ("Utilizing FacebookParser for %s" % target_name))
+            return FacebookParser.FbMsgParser(self, assignedCase, dataSource)
+        return None
+
+
+    """Generator of the conversations msgParser finds in the database stored at db_path, as they are parsed.  With a
+    parseCache they are loaded from it instead if this database was parsed before (key is its key there, computed if
+    not given), else saved to it as they are parsed.  An error from the parser is logged and ends the conversations
+    of that database"""
+    def parseTarget(self, msgParser, db_path, parseCache=None, key=None):
+        count = 0
+        conversations = None
+        try:
+            if parseCache != None:
+                if key == None:
+                    key = parseCache.key(msgParser, db_path)
+                conversations = parseCache.load(key, msgParser.contacts, msgParser.conversationType)
+                if conversations != None:
+                    self.log(Level.INFO, "Loading conversations for %s from parse cache %s" % (os.path.basename(db_path), key))
+                else:
+                    conversations = parseCache.store(key, msgParser.iterParse(db_path))
+            if conversations == None:
+                conversations = msgParser.iterParse(db_path)
+            for conversation in conversations:
+                count += 1
+                yield conversation
+        except Exception as e:
+            self.log(Level.SEVERE, "Uncaught error when parsing for: %s\n\t%s" % (msgParser.custom_header, e))
+        finally:
+            if conversations != None:
+                conversations.close()       # now, not when collected, if this is closed early
+        self.log(Level.INFO, "Found %s conversations for %s" % (count, os.path.basename(db_path)))
+
+
+    """Writes the conversations of one database to the report as they are taken from the iterable, with db_header
+    above them - nothing at all if there are none"""
+    def writeTranscript(self, conversations, db_header, pdf):
+        conversations = iter(conversations)
+        first = next(conversations, None)
+        if first != None:
+            self.convertToTranscript(itertools.chain([first], conversations), db_header, pdf)
+
+
+    """Writes the transcript of the database with key dbKey in parseCache, from its conversations, as a section of
+    sectionCache; or replays the section saved there by a previous report and stops pipe instead.  A section is only
+    reused while the database is in the parse cache, which means the section was drawn from all its conversations."""
+    def writeSection(self, conversations, header, dbKey, parseCache, sectionCache, pdf, pipe):
+        key = sectionCache.key(dbKey, pdf)
+        if parseCache.has(dbKey) and sectionCache.replay(key, pdf):
+            pipe.stop()
+            self.log(Level.INFO, "Reused the transcript rendered for %s in section %s" % (header, key))
+            return
+        sectionCache.begin(key, pdf)
+        complete = False
+        try:
+            self.writeTranscript(conversations, header, pdf)
+            complete = True
+        finally:
+            sectionCache.end(key, pdf, complete)
+
+
+    """Runs msgParser over the database stored at db_path and writes the conversations found to the report"""
+    def extractToReport(self, msgParser, db_path, pdf):
+        self.writeTranscript(self.parseTarget(msgParser, db_path), msgParser.custom_header, pdf)
+
+
+    """Finds target_name in dataSource, stores it in the copy cache (unless it is already there) and parses it, putting
+    each conversation into pipe as soon as it is parsed (after the parser's header and the database key in the parse
+    cache, put first) until the pipe is stopped, and closing pipe at the end.  Does not touch the pdf, so it runs on
+    a worker while the report is written (see generateReport).  Gives up before copying and before hashing the
+    database once the pipe is stopped (the report failed), so no work is left going on after the report."""
+    def extractTarget(self, currentCase, fileManager, copyCache, parseCache, dataSource, target_name, pipe):
+        try:
+            ds_name = dataSource.getName()
+            #-- Find specific target in datasource & save on disk
+            try:
+                files = fileManager.findFiles(dataSource, target_name)           # return first AbstractFile objects
+                if files == None:
+                    return
+                else:
+                    file = files[0]
+                    if pipe.stopped:
+                        return
+                    stored_dbPath, reused = copyCache.copy(file)        # named by object id, data source names may not be unique
+                    unqiue_filename = os.path.basename(stored_dbPath)
+                    if reused:
+                        self.log(Level.INFO, ("Found: %s in %s, already stored at %s" % (target_name, ds_name, stored_dbPath)))
+                    else:
+                        self.log(Level.INFO, ("Found: %s in %s, storing at %s" % (target_name, ds_name, stored_dbPath)))
+            except Exception as e:
+                # log error and move to next target
+                self.log(Level.WARNING, "Error with finding and writing %s to disk\n\t%s" % (target_name, e))
+                return
+
+            #-- Choose parser to use for database
+            msgParser = self.getParser(target_name, currentCase, dataSource)
+            if msgParser == None:
+                # log error and move to next target
+                self.log(Level.WARNING, "Could not find appropriate parser for %s, skipping" % unqiue_filename)
+                return
+
+            #-- Run chosen parser, handing over conversations as they are completed
+            if pipe.stopped:
+                return
+            key = parseCache.key(msgParser, stored_dbPath)
+            pipe.put((msgParser.custom_header, key))
+            conversations = self.parseTarget(msgParser, stored_dbPath, parseCache, key)
+            for conversation in conversations:
+                if not pipe.put(conversation):
+                    conversations.close()       # the report reused the transcript already rendered for this database
+                    break
+        finally:
+            pipe.close()
+
+
+    """Logs an error extractTarget let out, called on its worker while the error is handled.  Its database is left out
+    of the report, so this goes to the module log rather than to stderr"""
+    def logJobError(self, dataSource, target_name, e):
+        self.log(Level.SEVERE, "Uncaught error extracting %s from %s\n\t%s\n%s" % (target_name, dataSource.getName(), e, traceback.format_exc()))
+
+
+    """Number of targets generateReport works on at once: one per processor (up to 8) in Jython, whose threads run
+    in parallel, but just one elsewhere (CPython threads would only take turns on the GIL)"""
+    def getWorkerCount(self):
+        if self.workers != None:
+            return self.workers
+        if sys.platform.startswith("java"):
+            return min(8, cpuCount())
+        return 1
+
+
+
     #   See: http://sleuthkit.org/autopsy/docs/api-docs/latest/classorg_1_1sleuthkit_1_1autopsy_1_1report_1_1_report_progress_panel.html
     def generateReport(self, reportSettings, progressBar):
-        # target databases to search for
-        targets = ["mmssms.db", "threads_db2"]
-
         self.log(Level.INFO, "\n\n---------------- Begin Conversation Extractor report ----------------")
         # Get case, datasource and filemanager, and logger
         currentCase = Case.getCurrentCase()
@@ -142,71 +397,63 @@ class ConversationExtractorModule(GeneralReportModuleAdapter):
         fileManager = currentCase.getServices().getFileManager()
 
         # Create report file & log
-        report_name = "Extracted Conversations Report.pdf"
-        report_path = os.path.join(reportSettings.getReportDirectoryPath(), report_name)
-        self.log(Level.INFO, "Created report %s" % report_name)
+        report_path = os.path.join(reportSettings.getReportDirectoryPath(), self.reportName)
+        self.log(Level.INFO, "Created report %s" % self.reportName)
 
-        # Add report title
-        pdf = FPDF()    # autopage breaking enabled by default at 2cm
-        pdf.add_page()
-        pdf.set_font("Arial", "B", 24)
-        pdf.cell(0, 30, "Extracted Conversations Report", align='C', ln=1)
+        # Add report title (dates are worked out afresh for each report, in the time zone it is run in)
+        resetTimestampFormat()
+        pdf = self.createReport(report_path)
    
         # # Configure progress bar
         progressBar.setIndeterminate(True)
         progressBar.start()
 
-        # Find target dbs in all available data sources & parse
-        for dataSource in dataSourceList:
-            ds_name = dataSource.getName()
-            pdf.set_font("Arial", "I", 18)
-            pdf.set_text_color(0,0,0)
-            pdf.cell(0, 10, ds_name, ln=1)
-            for target_name in targets:
-                #-- Find specific target in datasource & save on disk
-                try:
-                    files = fileManager.findFiles(dataSource, target_name)           # return first AbstractFile objects
-                    if files == None:
-                        continue
-                    else:
-                        file = files[0]
-                        unqiue_filename = str(hash(ds_name)) + "-" + str(file.name)        
-                        stored_dbPath = os.path.join(currentCase.getTempDirectory(), unqiue_filename)
-                        ContentUtils.writeToFile(file, io.File(stored_dbPath))        
-                        self.log(Level.INFO, ("Found: %s in %s, storing at %s" % (target_name, ds_name, stored_dbPath)))
-                except Exception as e:
-                    # log error and move to next target
-                    self.log(Level.WARNING, "Error with finding and writing %s to disk\n\t%s" % (target_name, e))
-                    continue
-                    
-                #-- Choose parser to use for database --- ADD PARSERS HERE
-                if target_name == "mmssms.db":
-                    self.log(Level.INFO, ("Utilizing AndroidMsgParser for %s" % target_name))
-                    msgParser = AndroidMsgParser.MmssmsParser(self, currentCase, dataSource)
-                    header = msgParser.custom_header
-                elif target_name == "threads_db2":
-                    self.log(Level.INFO, ("Utilizing FacebookParser for %s" % target_name))
-                    msgParser = FacebookParser.FbMsgParser(self, currentCase, dataSource)
-                    header = msgParser.custom_header
-                else:
-                    # log error and move to next target
-                    self.log(Level.WARNING, "Could not find appropriate parser for %s, skipping" % unqiue_filename)
-                    continue
-
-                #-- Run chosen parser
-                try:
-                    extractedConversations = msgParser.parse(stored_dbPath)
-                except Exception as e:
-                    self.log(Level.SEVERE, "Uncaught error when parsing for: %s\n\t%s" % (header, e))
-                    continue
-
-                # Log conversations to report
-                if extractedConversations != None:
-                    self.log(Level.INFO, "Found %s conversations for %s" % (len(extractedConversations), unqiue_filename))
-                    self.convertToTranscript(extractedConversations, header, pdf)
-                
-        # Output report once all targets have been found and parsed
-        pdf.output(name=report_path)
+        pipes = []
+        try:
+            # Find target dbs in all available data sources & parse them on a pool of workers, every (data source, target)
+            # pair is a job.  Each job streams its conversations through its own bounded pipe while this thread writes
+            # them to the report, draining the pipes in job order so the report is the same as done serially.  Parsing
+            # overlaps layout, and memory is capped by the pipes rather than by the size of the devices.  The transcript
+            # of each database is kept as a section, reused on the next report if it would be drawn the same
+            jobs = [(ds_index, dataSource, target_name) for ds_index, dataSource in enumerate(dataSourceList) for target_name in self.targets]
+            pipes = [Pipe(self.pipeDepth) for job in jobs]
+            copyCache = TempCopyCache(os.path.join(currentCase.getTempDirectory(), self.tempCacheDir), self.tempCacheBytes)
+            parseCache = ParseCache(os.path.join(currentCase.getModuleDirectory(), self.parseCacheDir))
+            sectionCache = SectionCache(os.path.join(currentCase.getModuleDirectory(), self.sectionCacheDir), self.transcriptVersion)
+            pool = OrderedWorkerPool(self.getWorkerCount())
+            pool.spawn(lambda i: self.extractTarget(currentCase, fileManager, copyCache, parseCache, jobs[i][1], jobs[i][2], pipes[i]), range(len(jobs)),
+                       lambda i, e: self.logJobError(jobs[i][1], jobs[i][2], e))
+            previous_index = None
+            afterHeader = False
+            for i in range(len(jobs)):
+                ds_index, dataSource, target_name = jobs[i]
+                if ds_index != previous_index:
+                    self.writeDataSourceHeader(dataSource.getName(), pdf)
+                    previous_index = ds_index
+                    afterHeader = True
+                # Log conversations to report, a pipe holds the parser's header and database key then its conversations
+                conversations = iter(pipes[i])
+                first = next(conversations, None)
+                if first != None:
+                    header, key = first
+                    self.beginTranscript(pdf, afterHeader)
+                    afterHeader = False
+                    self.writeSection(conversations, header, key, parseCache, sectionCache, pdf, pipes[i])
+                pipes[i] = None
+            sectionCache.prune()
+            parseCache.prune()
+            self._contactRegistries = None      # only needed while parsing
+            resetTimestampFormat()
+
+            # Output report once all targets have been found and parsed
+            pdf.output(name=report_path)
+        finally:
+            # after an error: stop the workers still parsing and give up the report (nothing to do once output)
+            for pipe in pipes:
+                if pipe != None:
+                    pipe.stop()
+            pdf.abort()
+
         currentCase.addReport(report_path, self.moduleName, "Extracted Conversations")
         progressBar.complete(ReportStatus.COMPLETE)
 
@@ -8,38 +8,61 @@ April 14, 2024
 
 import os
 from datetime import datetime
-from java import io
-from java.lang import System
-from java.lang import Class
-from java.util.logging import Level
-from java.sql import DriverManager
-from org.sleuthkit.autopsy.datamodel import ContentUtils
+try:
+    from java import io
+    from java.lang import System
+    from java.lang import Class
+    from java.util.logging import Level
+    from java.sql import DriverManager
+    from org.sleuthkit.autopsy.datamodel import ContentUtils
+except ImportError:
+    # running outside Autopsy (see HeadlessRunner.py), the same JDBC calls are backed by sqlite3
+    from SqliteJdbc import Class
+    from SqliteJdbc import DriverManager
+    from Standalone import Level
 from util import Contact
 from util import Message
 from util import Conversation
+from util import ColumnarConversation
 
 
 
 class FbMsgParser():
     # global variables
     custom_header = "Facebook Messages (threads_db2.db)"         # custom header to display on conversation output
+    version = 2                                                  # bump whenever the conversations parsed change (invalidates the parse cache)
+    # every useful (non empty) message of every thread, ordered by thread then time
+    messageQuery = """
+        SELECT thread_key, sender, text, timestamp_ms
+            FROM messages
+            WHERE thread_key IN (SELECT thread_key FROM threads)
+                AND text IS NOT NULL
+                AND text NOT IN ('', ' ', 'None')
+            ORDER BY thread_key, timestamp_ms"""
 
     
     def __init__(self, parentModule, assignedCase, dataSource):        
         self.parentModule = parentModule            # should be the ConversationExtractorModule object that called this function
         self.assignedCase = assignedCase            # should be the case object this parser is running in
         self.parentDataSource = dataSource          # should be the data source in which the file the parser is analyzing was found
+        # kind of Conversation to build, see ConversationExtractorModule.columnarConversations
+        self.conversationType = ColumnarConversation if parentModule.columnarConversations else Conversation
+        self.contacts = parentModule.getContactRegistry(dataSource)     # shared with the other parsers of the data source
         
 
     """Connect log with log of the parent module"""
-    def log(self, level, msg):
-        self.parentModule.log(level, msg)
+    def log(self, level, msg, *args):
+        self.parentModule.log(level, msg, *args)
 
+    """Connect sampled (per-row) log with log of the parent module"""
+    def logSampled(self, level, msg, *args):
+        self.parentModule.logSampled(level, msg, *args)
 
-    """Parses text message database of Android phones, which should be located in mmssms.db.  Accepts path to file,
-    and returns a list of Conversation objects."""
-    def parse(self, db_path):
-        conversations = []
+
+    """Parses the Facebook Messenger database of Android phones, which should be located in threads_db2.  Accepts path
+    to file, and yields each Conversation as soon as the cursor moves past its last message, so only the conversation
+    being built is held in memory."""
+    def iterParse(self, db_path):
         self.log(Level.INFO, "Starting Facebook Messanger Parser --")
 
         #-- Initalize db connection
@@ -48,47 +71,41 @@ class FbMsgParser():
             conn = DriverManager.getConnection("jdbc:sqlite:%s" % db_path)
         except Exception as e:
             self.log(Level.SEVERE, "Unable to establish connection to %s\n\t%s" %(db_path, e))
-            return None
+            return
+        try:
+            for conversation in self.iterConversations(conn, db_path):
+                yield conversation
+        finally:
+            conn.close()        # also when the consumer stops early
+
 
-        #-- Find all distinct thread keys - each thread key corresponds to messages between two participants
+    """Generator of the conversations read through conn, see iterParse"""
+    def iterConversations(self, conn, db_path):
+        #-- Scan every message of every thread once, ordered by thread then time - each thread key corresponds to
+        #   messages between two participants, so the cursor is split into a conversation whenever the key changes.
+        #   Useless messages (empty or missing text) are dropped by the query itself
         try:
             statement = conn.createStatement()
-            resultSet = statement.executeQuery("""
-                SELECT DISTINCT thread_key 
-                    FROM threads""")
-            threadsList = []   
-            while resultSet.next() != False:
-                threadsList.append(resultSet.getString("thread_key"))
+            resultSet = statement.executeQuery(self.messageQuery)
         except Exception as e:
-            self.log(Level.WARNING, "Unable to query thread_keys from %s\n\t%s" % (db_path, e))
-            return None
-        
-        #-- For each thread key, extract messages
-        for thread_key in threadsList:
-            contact1 = Contact(None)        # contacts shouldnt be empty but workaround for now
-            contact2 = Contact(None)        # contacts shouldnt be empty but workaround for now
-            newConversation = Conversation(contact1, contact2)  
-
-            self.log(Level.INFO, "RETRIEVING DATA FOR -- %s" % thread_key)
-
-            # find all messages related to these two participants
-            try:
-                query = """SELECT sender, text, timestamp_ms
-                    FROM messages 
-                    WHERE thread_key = ?
-                    ORDER BY timestamp_ms"""                       
-                statement = conn.prepareStatement(query)
-                statement.setString(1, str(thread_key))
-                resultSet = statement.executeQuery()
-            except Exception as e:
-                self.log(Level.INFO, "Unable to query messages from thread %s in %s\n\t%s" % (thread_key, db_path, e))
-                continue
-
-            # extract information from messages
-            try:
-                while resultSet.next() != False:
+            self.log(Level.WARNING, "Unable to query messages from %s\n\t%s" % (db_path, e))
+            return
+
+        # extract information from messages
+        thread_key = None
+        newConversation = None
+        try:
+            while resultSet.next() != False:
+                # thread changed, close off previous conversation & start a new one
+                if newConversation is None or resultSet.getString(1) != thread_key:
+                    if newConversation is not None and newConversation.length() > 0:
+                        yield self.closeConversation(newConversation)
+                    thread_key = resultSet.getString(1)
+                    newConversation = self.conversationType(None, None)     # participants are the first two senders
+                    self.log(Level.FINE, "RETRIEVING DATA FOR -- %s", thread_key)
+                try:
                     # get sender info
-                    senderRawString = resultSet.getString(1)  # sender info is a dict, but must be retrieved first as a string
+                    senderRawString = resultSet.getString(2)  # sender info is a dict, but must be retrieved first as a string
                     if senderRawString is None or senderRawString =='None':
                         continue
                     else:
@@ -96,39 +113,41 @@ class FbMsgParser():
                         temp = senderRawString.split(",")
                         fb_key = temp[0].split('user_key:')[1]  
                         fb_name = temp[1].split('name:')[1]
-                    # create contacts if not done
-                    if contact1.id == None:
-                        contact1.id = fb_key 
-                        contact1.name = fb_name
-                    elif contact2.id == None and fb_key != contact1.id:
-                        contact2.id = fb_key 
-                        contact2.name = fb_name
+                    # fill in participants if not done
+                    sender = self.contacts.get(fb_key, fb_name)
+                    if newConversation.person1 is None:
+                        newConversation.person1 = sender
+                    elif newConversation.person2 is None and sender is not newConversation.person1:
+                        newConversation.person2 = sender
 
                     # extract rest of message info
-                    text = resultSet.getString("text")
-                    timestamp = int(resultSet.getString('timestamp_ms')) / 1000     # thread_db2.db uses Unix epoch in milliseconds
-                    utc_time = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+                    text = resultSet.getString(3)
+                    timestamp = int(resultSet.getString(4))     # thread_db2.db uses Unix epoch in milliseconds
+
+                    # add to conversation under its actual sender (in group threads, not always one of the participants)
+                    newConversation.add(sender, None, timestamp, text)     # receiver shouldnt be empty but whatever
+                    self.logSampled(Level.FINEST, "NEW MESSAGE ADDED - %s at %s: %s", sender, timestamp, text)
+                except Exception as e:
+                    # log error and move to next message
+                    self.logSampled(Level.INFO, "Unable to extract message from thread %s in %s\n\t%s", thread_key, db_path, e)
+                    continue
+        except Exception as e:
+            self.log(Level.INFO, "Error with extracting message data from resultSet\n\t%s" % e)
+        # add conversations to export list if it isnt empty
+        if newConversation is not None and newConversation.length() > 0:
+            yield self.closeConversation(newConversation)
 
-                    # dont add useless messages
-                    if text is None or text == 'None' or text == '' or text == ' ': 
-                        continue
-                    else:
-                        # match message with proper sender and add to conversation
-                        if fb_key == contact1.id:
-                            newMessage = Message(sender=contact1, receiver=None, date_sent=utc_time, content=text)  # receiver shouldnt be empty but whatever
-                        else:
-                            newMessage = Message(sender=contact2, receiver=None, date_sent=utc_time, content=text)  # receiver shouldnt be empty but whatever
-                        self.log(Level.INFO, "NEW MESSAGE ADDED - %s" % newMessage)
-                        newConversation.addMsg(newMessage)
-                # add conversations to export list if it isnt empty
-                if newConversation.length() > 0:
-                    conversations.append(newConversation)
-
-            except Exception as e:
-                self.log(Level.INFO, "Error with extracting message data from resultSet\n\t%s" % e)
-                continue
-
-        #-- Return parser results
+
+    """Returns conversation with a placeholder for a participant that never sent anything"""
+    def closeConversation(self, conversation):
+        if conversation.person2 is None:
+            conversation.person2 = Contact(None)        # contacts shouldnt be empty but workaround for now
+        return conversation
+
+
+    """Returns the conversations of the database at db_path as a list (None if there are none), see iterParse"""
+    def parse(self, db_path):
+        conversations = list(self.iterParse(db_path))
         if conversations != []:
             return conversations
         else:
@@ -0,0 +1,93 @@
+"""
+Runs the conversation extractor outside Autopsy, over databases that were already extracted
+from the device images.  Each directory given is treated as one data source: the target
+databases (mmssms.db, threads_db2) are looked for anywhere under it and the report is
+written the same way generateReport does.  With --case, generateReport itself is run
+against a stand-in Autopsy case (see Standalone.py) kept in the given directory, so the
+whole path (finding files, copying them to the case temp directory, ...) is exercised.
+
+    python HeadlessRunner.py [-o report.pdf | --case CASE_DIR] [-v] DEVICE_DIR [DEVICE_DIR ...]
+"""
+
+
+import os
+import sys
+import logging
+import argparse
+
+from Standalone import Level
+from Standalone import Case
+from Standalone import ProgressBar
+from Standalone import ReportSettings
+
+from ConversationExtractorModule import ConversationExtractorModule
+
+
+
+"""Returns the path of the first file named target_name under directory (in sorted order), or None"""
+def findTarget(directory, target_name):
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        if target_name in files:
+            return os.path.join(root, target_name)
+    return None
+
+
+"""Writes the conversations report for the data source directories to report_path"""
+def run(dataSourceDirs, report_path):
+    module = ConversationExtractorModule()
+    pdf = module.createReport(report_path)
+    try:
+        for directory in dataSourceDirs:
+            ds_name = os.path.basename(os.path.normpath(directory))
+            module.writeDataSourceHeader(ds_name, pdf)
+            afterHeader = True
+            for target_name in module.targets:
+                db_path = findTarget(directory, target_name)
+                if db_path == None:
+                    continue
+                module.log(Level.INFO, "Found: %s in %s" % (target_name, ds_name))
+                msgParser = module.getParser(target_name, None, directory)
+                if msgParser == None:
+                    module.log(Level.WARNING, "Could not find appropriate parser for %s, skipping" % db_path)
+                    continue
+                module.beginTranscript(pdf, afterHeader)
+                afterHeader = False
+                module.extractToReport(msgParser, db_path, pdf)
+        pdf.output(name=report_path)
+    finally:
+        pdf.abort()         # after an error, nothing to do once output
+
+
+"""Runs generateReport over the data source directories in a stand-in case kept in caseDir, returns the case"""
+def runCase(dataSourceDirs, caseDir, workers=None):
+    case = Case.openCase(dataSourceDirs, caseDir)
+    progressBar = ProgressBar()
+    module = ConversationExtractorModule()
+    module.workers = workers
+    module.generateReport(ReportSettings(case.getReportDirectory()), progressBar)
+    return case
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract conversations from Android databases into a PDF report, without Autopsy.")
+    parser.add_argument("directories", nargs="+", metavar="DEVICE_DIR", help="directory holding the databases extracted from one device")
+    parser.add_argument("-o", "--output", default=ConversationExtractorModule.reportName, help="report file to write (default: %(default)s)")
+    parser.add_argument("--case", metavar="CASE_DIR", help="go through generateReport, with a stand-in case kept in CASE_DIR (the report is written to its Reports directory)")
+    parser.add_argument("--workers", type=int, help="with --case, databases parsed at once (default: see ConversationExtractorModule.getWorkerCount)")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="log more (repeat for parser details)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=[logging.WARNING, logging.INFO, logging.DEBUG][min(args.verbose, 2)], format="%(levelname)s %(message)s")
+    for directory in args.directories:
+        if not os.path.isdir(directory):
+            parser.error("%s is not a directory" % directory)
+    if args.case:
+        runCase(args.directories, args.case, args.workers)
+    else:
+        run(args.directories, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
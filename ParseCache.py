@@ -0,0 +1,177 @@
+import os
+import time
+import gzip
+import json
+import numbers
+import hashlib
+import tempfile
+from util import ContactRegistry
+from util import Message
+from util import Conversation
+
+
+
+"""Conversations parsed out of databases, saved in a directory of the case so an unchanged database is not parsed
+again the next time a report is generated.  An entry is keyed by the SHA-256 of the database and the parser's class
+and version, and holds one line of gzipped JSON per conversation:
+
+    [[person1 id, person1 name], [person2 id, person2 name], [[sender, receiver, timestamp, content], ...]]
+
+where sender/receiver are 1 or 2 for person1/person2, 0 for None, or an [id, name] pair for any other contact, and
+timestamp is in Unix epoch milliseconds (or the date_sent text, for a message without one).
+Entries are read and written a conversation at a time, like the parsers produce them, and contacts are read back
+into the parser's ContactRegistry so they are shared as if parsed.  Entries the last report did not use are deleted by
+prune."""
+
+class ParseCache():
+    def __init__(self, directory):
+        self.directory = directory
+        self.used = set()           # names of the entries of the databases in this report
+        self.started = time.time()  # partial entries older than this were left by an earlier run
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    """Returns the key of the conversations msgParser produces from the database at db_path, counting its entry as
+    used by this report (see prune)"""
+    def key(self, msgParser, db_path):
+        digest = hashlib.sha256()
+        with open(db_path, "rb") as f:
+            while True:
+                block = f.read(1024 * 1024)
+                if not block:
+                    break
+                digest.update(block)
+        key = "%s-%s-v%s" % (digest.hexdigest(), msgParser.__class__.__name__, msgParser.version)
+        self.used.add(os.path.basename(self.path(key)))
+        return key
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".json.gz")
+
+    """Returns True if conversations are saved under key"""
+    def has(self, key):
+        return os.path.isfile(self.path(key))
+
+    """Returns a generator of the conversations saved under key, as conversationType objects (their contacts taken
+    from the ContactRegistry contacts, if given), or None if there are none.  The whole entry is checked before the first conversation is
+    handed out: one that cannot be read is deleted (so it is parsed again) and None returned, so a transcript is
+    never drawn from part of an entry.  Should it fail once checked, it is deleted all the same and the error raised."""
+    def load(self, key, contacts=None, conversationType=Conversation):
+        path = self.path(key)
+        if not self.has(key):
+            return None
+        try:
+            self.check(path)
+        except Exception:
+            self._remove(path)
+            return None
+        return self._read(path, contacts, conversationType)
+
+    """Reads through the entry at path, raises an exception if it is not complete and well-formed"""
+    def check(self, path):
+        lines = 0
+        with gzip.open(path, "rb") as f:
+            for line in f:                  # the gzip CRC is checked once the end is reached
+                entry = json.loads(line.decode("utf-8"))
+                if not (isinstance(entry, list) and len(entry) == 3 and self._isContact(entry[0])
+                        and self._isContact(entry[1]) and isinstance(entry[2], list)):
+                    raise ValueError("Malformed conversation in %s" % path)
+                for message in entry[2]:
+                    if not (isinstance(message, list) and len(message) == 4 and self._isSender(message[0])
+                            and self._isSender(message[1])):
+                        raise ValueError("Malformed message in %s" % path)
+                lines += 1
+        if lines == 0:
+            raise ValueError("No conversations in %s" % path)
+
+    def _isContact(self, c):
+        return isinstance(c, list) and len(c) == 2
+
+    def _isSender(self, c):
+        return c in (0, 1, 2) or self._isContact(c)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _read(self, path, contacts, conversationType):
+        try:
+            with gzip.open(path, "rb") as f:
+                for line in f:
+                    yield self.decode(json.loads(line.decode("utf-8")), contacts, conversationType)
+        except Exception:
+            self._remove(path)
+            raise
+
+    """Generator passing on the conversations, saving them under key as they go by.  The entry is only kept if the
+    conversations run out normally and there was at least one (a database that failed to open yields none)."""
+    def store(self, key, conversations):
+        handle, partial = tempfile.mkstemp(suffix=".part", dir=self.directory)
+        os.close(handle)
+        complete = False
+        count = 0
+        try:
+            with gzip.open(partial, "wb") as f:
+                for conversation in conversations:
+                    f.write((json.dumps(self.encode(conversation)) + "\n").encode("utf-8"))
+                    count += 1
+                    yield conversation
+            complete = True
+        finally:
+            conversations.close()
+            if complete and count > 0:
+                path = self.path(key)
+                if os.path.exists(path):
+                    os.remove(path)
+                os.rename(partial, path)
+            else:
+                os.remove(partial)
+
+    """Deletes the entries not used by this report (databases that changed or left the case, or parsed by an earlier
+    parser version) and the partial entries left by an earlier run"""
+    def prune(self):
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if name.endswith(".json.gz"):
+                    if name not in self.used:
+                        os.remove(path)
+                elif name.endswith(".part") and os.path.getmtime(path) < self.started:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def encode(self, conversation):
+        person1 = conversation.person1
+        person2 = conversation.person2
+        def contact(c):
+            if c is None:
+                return 0
+            elif c is person1:
+                return 1
+            elif c is person2:
+                return 2
+            return [c.id, c.name]
+        return [[person1.id, person1.name], [person2.id, person2.name],
+                [[contact(m.sender), contact(m.receiver), m.date_sent if m.timestamp is None else m.timestamp, m.content]
+                 for m in conversation.messages]]
+
+    def decode(self, entry, registry=None, conversationType=Conversation):
+        if registry is None:
+            registry = ContactRegistry()        # still one Contact per identifier within the conversation
+        person1 = registry.get(entry[0][0], entry[0][1])
+        person2 = registry.get(entry[1][0], entry[1][1])
+        contacts = [None, person1, person2]
+        def contact(c):
+            if isinstance(c, list):
+                return registry.get(c[0], c[1])
+            return contacts[c]
+        conversation = conversationType(person1, person2)
+        for sender, receiver, sent, content in entry[2]:
+            if isinstance(sent, numbers.Integral):
+                conversation.add(contact(sender), contact(receiver), sent, content)
+            else:
+                conversation.addMsg(Message(contact(sender), contact(receiver), sent, content))
+        return conversation
@@ -0,0 +1,68 @@
+import os
+import hashlib
+from util import localTimeZone
+
+
+
+"""Rendered transcripts of databases (report sections, see FPDF.begin_section), kept in a directory of the case so a
+report can be regenerated without rendering again the databases that did not change.  A section is keyed by the key
+of the database's conversations (see ParseCache), the version of the transcript layout, the local time zone dates are
+shown in and the drawing state of the report where it starts, so it is only reused where it would come out exactly
+the same.  Sections the last report did
+not use are deleted by prune."""
+
+class SectionCache():
+    def __init__(self, directory, version):
+        self.directory = directory
+        self.version = version
+        self.used = set()           # names of the sections replayed or recorded for this report
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    """Returns the key of the section of the database with key dbKey, drawn from the current state of pdf (in the
+    current local time zone)"""
+    def key(self, dbKey, pdf):
+        state = "%s\n%s\n%s\n%s" % (dbKey, self.version, localTimeZone(), pdf.section_state())
+        return hashlib.sha256(state.encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".section")
+
+    """Draws the section saved under key on pdf, returns False (having drawn nothing) if there is none usable"""
+    def replay(self, key, pdf):
+        path = self.path(key)
+        if not os.path.isfile(path):
+            return False
+        try:
+            pdf.replay_section(path)
+        except RuntimeError:
+            # incomplete, corrupt or not from this state (checked before drawing anything), render it again instead
+            os.remove(path)
+            return False
+        self.used.add(os.path.basename(path))
+        return True
+
+    """Starts recording what is drawn on pdf, to be saved under key by end"""
+    def begin(self, key, pdf):
+        pdf.begin_section(self.path(key) + ".part")
+
+    """Stops recording the section begun under key, keeping it only if complete"""
+    def end(self, key, pdf, complete):
+        path = self.path(key)
+        pdf.end_section()
+        if complete:
+            if os.path.exists(path):
+                os.remove(path)
+            os.rename(path + ".part", path)
+            self.used.add(os.path.basename(path))
+        else:
+            os.remove(path + ".part")
+
+    """Deletes the sections not used by this report"""
+    def prune(self):
+        for name in os.listdir(self.directory):
+            if name not in self.used:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
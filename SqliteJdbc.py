@@ -0,0 +1,138 @@
+import numbers
+import sqlite3
+
+try:
+    _text = unicode
+except NameError:
+    _text = str
+
+
+
+"""Stand-in for the JDBC calls the parsers make (Class.forName, DriverManager.getConnection, createStatement,
+prepareStatement, executeQuery, ResultSet.next/getString), backed by Python's sqlite3 so they can run outside Autopsy/Jython."""
+
+class Class():
+    """Drivers need no loading here, so forName(...).newInstance() does nothing"""
+    @staticmethod
+    def forName(name):
+        return Class()
+
+    def newInstance(self):
+        return None
+
+
+
+class DriverManager():
+    """Accepts the same 'jdbc:sqlite:<path>' urls as the sqlite JDBC driver"""
+    @staticmethod
+    def getConnection(url):
+        prefix = "jdbc:sqlite:"
+        if not url.startswith(prefix):
+            raise ValueError("Unsupported database url %s" % url)
+        return Connection(url[len(prefix):])
+
+
+
+class Connection():
+    queries = 0         # statements executed through any connection (see Benchmark.py)
+
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.text_factory = _decodeText     # sqlite JDBC replaces bad utf-8 instead of failing the whole query
+
+    def createStatement(self):
+        return Statement(self.conn)
+
+    def prepareStatement(self, query):
+        return PreparedStatement(self.conn, query)
+
+    def close(self):
+        self.conn.close()
+
+
+
+class Statement():
+    def __init__(self, conn):
+        self.conn = conn
+
+    "Runs query and returns a ResultSet positioned before its first row"
+    def executeQuery(self, query):
+        Connection.queries += 1
+        return ResultSet(self.conn.execute(query))
+
+    def close(self):
+        pass
+
+
+
+class PreparedStatement():
+    def __init__(self, conn, query):
+        self.conn = conn
+        self.query = query
+        self.parameters = {}
+
+    "Binds the ? at index (1-based) to value"
+    def setString(self, index, value):
+        self.parameters[index] = value
+
+    setInt = setString
+
+    "Runs the query with the values bound so far and returns a ResultSet positioned before its first row"
+    def executeQuery(self):
+        Connection.queries += 1
+        values = [self.parameters[i] for i in range(1, len(self.parameters) + 1)]
+        return ResultSet(self.conn.execute(self.query, values))
+
+    def close(self):
+        pass
+
+
+
+class ResultSet():
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.rows = iter(cursor)
+        self.row = None
+        # JDBC column labels are case insensitive, indexes start at 1
+        self.columns = dict((col[0].lower(), i) for i, col in enumerate(cursor.description))
+
+    "Moves to the next row, returns False once there are none left"
+    def next(self):
+        for row in self.rows:
+            self.row = row
+            return True
+        self.row = None
+        return False
+
+    "Returns the value of a column (1-based index or label) as a string, or None if it is NULL"
+    def getString(self, column):
+        value = self._get(column)
+        if value is None or isinstance(value, _text):
+            return value
+        if isinstance(value, numbers.Number):
+            return str(value)
+        return _decodeText(bytes(value))       # blob
+
+    "Returns the value of a column as an int, 0 if it is NULL (as JDBC does)"
+    def getInt(self, column):
+        value = self._get(column)
+        if value is None:
+            return 0
+        return int(value)
+
+    getLong = getInt
+
+    def close(self):
+        self.cursor.close()
+
+    def _get(self, column):
+        if self.row is None:
+            raise ValueError("ResultSet is not positioned on a row")
+        if isinstance(column, int):
+            return self.row[column - 1]
+        return self.row[self.columns[column.lower()]]
+
+
+
+def _decodeText(data):
+    return data.decode("utf-8", "replace")
@@ -0,0 +1,214 @@
+import os
+import shutil
+import hashlib
+import logging
+
+
+
+"""Stand-ins for the Java/Autopsy classes the module and parsers use, for running them outside Autopsy
+(see HeadlessRunner.py).  Only what is actually called is provided; the case and its data sources
+are backed by a directory tree."""
+
+class Level():
+    # java.util.logging levels, as the matching Python logging levels
+    SEVERE = logging.ERROR
+    WARNING = logging.WARNING
+    INFO = logging.INFO
+    CONFIG = 15
+    FINE = logging.DEBUG
+    FINER = 7
+    FINEST = 5
+
+
+
+class Logger():
+    def __init__(self, name):
+        self.logger = logging.getLogger(name)
+
+    @staticmethod
+    def getLogger(name):
+        return Logger(name)
+
+    def isLoggable(self, level):
+        return self.logger.isEnabledFor(level)
+
+    def logp(self, level, sourceClass, sourceMethod, msg):
+        self.logger.log(level, "%s.%s: %s", sourceClass, sourceMethod, msg)
+
+
+
+class GeneralReportModuleAdapter(object):
+    pass
+
+
+
+class ReportStatus():
+    COMPLETE = "COMPLETE"
+    ERROR = "ERROR"
+    CANCELED = "CANCELED"
+
+
+
+class io():
+    """java.io, only File is used"""
+    class File():
+        def __init__(self, path):
+            self.path = path
+
+        def getPath(self):
+            return self.path
+
+
+
+"""A case whose data sources are directories (the files found in each are the ones under it), with its temp and
+report files kept under caseDir.  Open it with Case.openCase, after which it is what Case.getCurrentCase() returns."""
+
+class Case():
+    _currentCase = None
+
+    def __init__(self, dataSourceDirs, caseDir):
+        self.dataSources = [DataSource(directory) for directory in dataSourceDirs]
+        self.caseDir = caseDir
+        self.services = Services()
+        self.reports = []               # (path, module name, report name) of every report added
+
+    @staticmethod
+    def openCase(dataSourceDirs, caseDir):
+        case = Case(dataSourceDirs, caseDir)
+        for directory in (case.getTempDirectory(), case.getReportDirectory()):
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+        Case._currentCase = case
+        return case
+
+    @staticmethod
+    def getCurrentCase():
+        if Case._currentCase == None:
+            raise RuntimeError("No current case")
+        return Case._currentCase
+
+    def getDataSources(self):
+        return self.dataSources
+
+    def getServices(self):
+        return self.services
+
+    def getTempDirectory(self):
+        return os.path.join(self.caseDir, "Temp")
+
+    def getReportDirectory(self):
+        return os.path.join(self.caseDir, "Reports")
+
+    def getModuleDirectory(self):
+        return os.path.join(self.caseDir, "ModuleOutput")
+
+    def addReport(self, path, sourceModuleName, reportName):
+        self.reports.append((path, sourceModuleName, reportName))
+
+
+
+class Services():
+    def __init__(self):
+        self.fileManager = FileManager()
+
+    def getFileManager(self):
+        return self.fileManager
+
+
+
+class DataSource():
+    def __init__(self, path):
+        self.path = path
+
+    def getName(self):
+        return os.path.basename(os.path.normpath(self.path))
+
+
+
+class AbstractFile():
+    def __init__(self, path, objId=0):
+        self.path = path
+        self.objId = objId
+        self.name = os.path.basename(path)
+
+    def getId(self):
+        return self.objId
+
+    def getName(self):
+        return self.name
+
+    def getSize(self):
+        return os.path.getsize(self.path)
+
+    def getMtime(self):
+        return int(os.path.getmtime(self.path))
+
+    def getMd5Hash(self):
+        return None                 # as in a case the hash lookup module was not run on
+
+
+
+class FileManager():
+    """Returns every file named fileName under the data source (like Autopsy, an empty list if there are none)"""
+    def findFiles(self, dataSource, fileName):
+        found = []
+        for root, dirs, files in os.walk(dataSource.path):
+            dirs.sort()
+            if fileName in files:
+                found.append(AbstractFile(os.path.join(root, fileName), self._objId(os.path.join(root, fileName))))
+        return found
+
+    """Returns the object id of the file at path: derived from its absolute path, so (like an Autopsy object id) a file
+    keeps it from one run to the next whatever order the files are found in"""
+    def _objId(self, path):
+        path = os.path.abspath(path)
+        if not isinstance(path, bytes):
+            path = path.encode("utf-8")
+        return int(hashlib.sha1(path).hexdigest()[:12], 16)
+
+
+
+class ContentUtils():
+    """Copies the contents of an AbstractFile to a java.io.File"""
+    @staticmethod
+    def writeToFile(content, outputFile):
+        shutil.copyfile(content.path, outputFile.getPath())
+
+
+
+class ReportSettings():
+    def __init__(self, reportDirectoryPath):
+        self.reportDirectoryPath = reportDirectoryPath
+
+    def getReportDirectoryPath(self):
+        return self.reportDirectoryPath
+
+
+
+class ProgressBar():
+    """Keeps what the report module reports through its progress panel (status label and final status)"""
+    def __init__(self):
+        self.indeterminate = False
+        self.started = False
+        self.progress = 0
+        self.maximum = 0
+        self.statusLabel = None
+        self.status = None
+
+    def setIndeterminate(self, indeterminate):
+        self.indeterminate = indeterminate
+
+    def start(self):
+        self.started = True
+
+    def setMaximumProgress(self, maximum):
+        self.maximum = maximum
+
+    def increment(self):
+        self.progress += 1
+
+    def updateStatusLabel(self, statusLabel):
+        self.statusLabel = statusLabel
+
+    def complete(self, status):
+        self.status = status
@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+Writes synthetic device databases (mmssms.db, contacts2.db, threads_db2) with the tables and
+columns the parsers read, for benchmarking the extractor on realistic volumes.
+
+    python SyntheticDevice.py OUTPUT_DIR [--messages N] [--addresses N] [--body-length N]
+                              [--body-dist exp|lognormal|fixed] [--unicode R] [--group-ratio R] [--seed N]
+"""
+
+
+import os
+import sys
+import json
+import math
+import random
+import sqlite3
+import argparse
+
+
+
+WORDS = ("ok", "lol", "hey", "where", "are", "you", "omw", "see", "u", "at", "5", "tonight", "the", "meeting", "got",
+         "moved", "to", "tomorrow", "morning", "haha", "yeah", "sounds", "good", "call", "me", "later", "can't", "wait",
+         "did", "get", "my", "message?", "running", "late,", "sorry!", "just", "landed", "pick", "up", "milk", "please")
+UNICODE_WORDS = (u"caf\xe9", u"na\xefve", u"Zo\xeb", u"\xbfqu\xe9?", u"stra\xdfe", u"привет",
+                 u"你好", u"ありがとう", u"مرحبا", u"☃",
+                 u"\U0001f602", u"\U0001f44d", u"❤️")
+FIRST_NAMES = ("Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Avery", "Quinn", "Chris", "Pat")
+UNICODE_NAMES = (u"Zo\xeb", u"Ren\xe9e", u"J\xfcrgen", u"李雷", u"Саша", u"Fran\xe7ois")
+LAST_NAMES = ("Smith", "Lee", "Garcia", "Nguyen", "Brown", "Khan", "Muller", "Rossi", "Silva", "Cohen", "Kim", "Ward")
+
+START_MS = 1577836800000            # 2020-01-01, messages are spread over the following SPAN_MS
+SPAN_MS = 4 * 365 * 24 * 3600 * 1000
+BATCH = 10000                       # rows per executemany call
+
+
+
+class DeviceSpec():
+    def __init__(self, messages=10000, fb_messages=None, addresses=None, contact_ratio=0.6, body_length=60,
+                 body_dist="exp", unicode_ratio=0.1, group_ratio=0.1, junk_ratio=0.01, seed=1):
+        self.messages = messages                    # sms rows to write
+        if fb_messages is None:
+            fb_messages = messages
+        self.fb_messages = fb_messages              # facebook messenger rows to write
+        if addresses is None:
+            addresses = max(2, int(math.sqrt(messages)))
+        self.addresses = addresses                  # distinct phone numbers / facebook users talked to
+        self.contact_ratio = contact_ratio          # share of addresses saved in contacts2.db
+        self.body_length = body_length              # mean message length in characters
+        self.body_dist = body_dist                  # distribution of message lengths: exp, lognormal or fixed
+        self.unicode_ratio = unicode_ratio          # share of messages (and names) with non latin-1 text
+        self.group_ratio = group_ratio              # share of threads with more than one other participant
+        self.junk_ratio = junk_ratio                # share of rows the parsers should skip (no address/text/sender)
+        self.seed = seed
+
+    "Returns the spec as a dict (for result files and cache keys)"
+    def asDict(self):
+        return dict(self.__dict__)
+
+    "Returns a short name that identifies the spec, to use as a directory name"
+    def key(self):
+        return "m%d-f%d-a%d-c%g-l%d%s-u%g-g%g-j%g-s%d" % (self.messages, self.fb_messages, self.addresses,
+                    self.contact_ratio, self.body_length, self.body_dist, self.unicode_ratio, self.group_ratio,
+                    self.junk_ratio, self.seed)
+
+
+
+class DeviceWriter():
+    def __init__(self, spec):
+        self.spec = spec
+        self.random = random.Random(spec.seed)
+        # message bodies are slices of these, much faster than assembling every body word by word
+        self.corpus = self._corpus(WORDS, 200000)
+        self.unicodeCorpus = self._corpus(WORDS + UNICODE_WORDS * 3, 200000)
+        self.numbers = ["+1%03d555%04d" % (200 + i // 10000, i % 10000) for i in range(spec.addresses)]
+        self.names = [self._name() for i in range(spec.addresses)]
+
+    "Writes the three databases to directory, returns the number of rows written to each"
+    def write(self, directory):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        return {
+            "mmssms.db": self.writeMmssms(os.path.join(directory, "mmssms.db")),
+            "contacts2.db": self.writeContacts(os.path.join(directory, "contacts2.db")),
+            "threads_db2": self.writeThreads(os.path.join(directory, "threads_db2")),
+        }
+
+    def writeMmssms(self, path):
+        r = self.random
+        conn = self._create(path, """
+            CREATE TABLE canonical_addresses (_id INTEGER PRIMARY KEY, address TEXT);
+            CREATE TABLE threads (_id INTEGER PRIMARY KEY, date INTEGER DEFAULT 0, message_count INTEGER DEFAULT 0,
+                recipient_ids TEXT, snippet TEXT, snippet_cs INTEGER DEFAULT 0, read INTEGER DEFAULT 1,
+                type INTEGER DEFAULT 0, error INTEGER DEFAULT 0, has_attachment INTEGER DEFAULT 0);
+            CREATE TABLE sms (_id INTEGER PRIMARY KEY, thread_id INTEGER, address TEXT, person INTEGER, date INTEGER,
+                date_sent INTEGER DEFAULT 0, protocol INTEGER, read INTEGER DEFAULT 0, status INTEGER DEFAULT -1,
+                type INTEGER, reply_path_present INTEGER, subject TEXT, body TEXT, service_center TEXT,
+                locked INTEGER DEFAULT 0, error_code INTEGER DEFAULT 0, seen INTEGER DEFAULT 0);
+            CREATE INDEX typeThreadIdIndex ON sms (type, thread_id);""")
+        conn.executemany("INSERT INTO canonical_addresses VALUES (?, ?)", ((i + 1, n) for i, n in enumerate(self.numbers)))
+        threads = self._threads()
+        conn.executemany("INSERT INTO threads (_id, recipient_ids, type) VALUES (?, ?, ?)",
+                         ((t + 1, " ".join(str(a + 1) for a in members), int(len(members) > 1)) for t, members in enumerate(threads)))
+
+        def rows():
+            written = 0
+            while written < self.spec.messages:
+                t = r.randrange(len(threads))
+                members = threads[t]
+                date = START_MS + r.randrange(SPAN_MS)
+                body = self._body()
+                if r.random() < 0.5:
+                    # incoming, from one member
+                    recipients = [r.choice(members)]
+                    msgType = 1
+                else:
+                    # outgoing, android keeps one row per recipient of a group message
+                    recipients = members
+                    msgType = 2
+                for a in recipients:
+                    address = self.numbers[a]
+                    if r.random() < self.spec.junk_ratio:
+                        address = None
+                    yield (t + 1, address, date, date - r.randrange(5000), msgType, body, 1, 1)
+                    written += 1
+                    if written >= self.spec.messages:
+                        break
+        for batch in self._batches(rows()):
+            conn.executemany("INSERT INTO sms (thread_id, address, date, date_sent, type, body, read, seen) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+        conn.commit()
+        conn.close()
+        return self.spec.messages
+
+    def writeContacts(self, path):
+        r = self.random
+        conn = self._create(path, """
+            CREATE TABLE mimetypes (_id INTEGER PRIMARY KEY, mimetype TEXT NOT NULL);
+            CREATE TABLE raw_contacts (_id INTEGER PRIMARY KEY, contact_id INTEGER, display_name TEXT,
+                display_name_alt TEXT, deleted INTEGER NOT NULL DEFAULT 0, times_contacted INTEGER DEFAULT 0);
+            CREATE TABLE data (_id INTEGER PRIMARY KEY, raw_contact_id INTEGER NOT NULL, mimetype_id INTEGER NOT NULL,
+                is_primary INTEGER NOT NULL DEFAULT 0, data1 TEXT, data2 TEXT, data3 TEXT, data4 TEXT);
+            CREATE TABLE phone_lookup (data_id INTEGER NOT NULL, raw_contact_id INTEGER NOT NULL,
+                normalized_number TEXT NOT NULL, min_match TEXT NOT NULL);
+            CREATE INDEX phone_lookup_index ON phone_lookup (normalized_number, raw_contact_id, data_id);""")
+        conn.executemany("INSERT INTO mimetypes VALUES (?, ?)", [(1, "vnd.android.cursor.item/phone_v2"), (2, "vnd.android.cursor.item/name")])
+        saved = [a for a in range(self.spec.addresses) if r.random() < self.spec.contact_ratio]
+        conn.executemany("INSERT INTO raw_contacts (_id, contact_id, display_name, display_name_alt) VALUES (?, ?, ?, ?)",
+                         ((i + 1, i + 1, self.names[a], self.names[a]) for i, a in enumerate(saved)))
+        conn.executemany("INSERT INTO data (_id, raw_contact_id, mimetype_id, data1, data2) VALUES (?, ?, ?, ?, ?)",
+                         ((2 * i + 1, i + 1, 1, self.numbers[a], "2") for i, a in enumerate(saved)))
+        conn.executemany("INSERT INTO data (_id, raw_contact_id, mimetype_id, data1) VALUES (?, ?, ?, ?)",
+                         ((2 * i + 2, i + 1, 2, self.names[a]) for i, a in enumerate(saved)))
+        conn.executemany("INSERT INTO phone_lookup VALUES (?, ?, ?, ?)",
+                         ((2 * i + 1, i + 1, self.numbers[a][::-1], self.numbers[a][::-1][:7]) for i, a in enumerate(saved)))
+        conn.commit()
+        conn.close()
+        return len(saved)
+
+    def writeThreads(self, path):
+        r = self.random
+        conn = self._create(path, """
+            CREATE TABLE threads (thread_key TEXT PRIMARY KEY, thread_fbid TEXT, name TEXT, timestamp_ms INTEGER,
+                last_read_timestamp_ms INTEGER, snippet TEXT, folder TEXT);
+            CREATE TABLE thread_users (user_key TEXT PRIMARY KEY, first_name TEXT, last_name TEXT, name TEXT);
+            CREATE TABLE thread_participants (thread_key TEXT, user_key TEXT, type TEXT);
+            CREATE TABLE messages (msg_id TEXT PRIMARY KEY, thread_key TEXT, action_id INTEGER, text TEXT,
+                sender TEXT, timestamp_ms INTEGER, timestamp_sent_ms INTEGER, msg_type INTEGER, source TEXT);
+            CREATE INDEX messages_timestamp_index ON messages (thread_key, timestamp_ms DESC);""")
+        owner = ("FACEBOOK:100000000", "Device Owner")
+        users = [("FACEBOOK:%d" % (100000001 + a), self.names[a]) for a in range(self.spec.addresses)]
+        conn.executemany("INSERT INTO thread_users (user_key, name) VALUES (?, ?)", [owner] + users)
+        threads = []
+        for t, members in enumerate(self._threads()):
+            if len(members) > 1:
+                key = "GROUP:%d" % (900000000 + t)
+            else:
+                key = "ONE_TO_ONE:%s:%s" % (owner[0].split(":")[1], users[members[0]][0].split(":")[1])
+            threads.append((key, [owner] + [users[a] for a in members]))
+        conn.executemany("INSERT INTO threads (thread_key, thread_fbid, folder) VALUES (?, ?, 'inbox')",
+                         ((key, key.split(":")[-1]) for key, members in threads))
+        conn.executemany("INSERT INTO thread_participants VALUES (?, ?, 'PARTICIPANT')",
+                         ((key, user[0]) for key, members in threads for user in members))
+
+        def rows():
+            for i in range(self.spec.fb_messages):
+                key, members = threads[r.randrange(len(threads))]
+                user = r.choice(members)
+                sender = json.dumps({"user_key": user[0], "name": user[1]}, separators=(",", ":"), ensure_ascii=False)
+                text = self._body()
+                junk = r.random()
+                if junk < self.spec.junk_ratio:
+                    if junk < self.spec.junk_ratio / 2:
+                        text = r.choice((None, "", " "))
+                    else:
+                        sender = None
+                date = START_MS + r.randrange(SPAN_MS)
+                yield ("mid.$%x" % i, key, text, sender, date, date, 0)
+        for batch in self._batches(rows()):
+            conn.executemany("INSERT INTO messages (msg_id, thread_key, text, sender, timestamp_ms, timestamp_sent_ms, msg_type) VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+        conn.commit()
+        conn.close()
+        return self.spec.fb_messages
+
+    "Returns the threads (lists of address indexes): one per address, plus group threads making up group_ratio of them"
+    def _threads(self):
+        r = random.Random(self.spec.seed + 1)       # same threads for sms and facebook, whatever was generated before
+        threads = [[a] for a in range(self.spec.addresses)]
+        groups = int(self.spec.addresses * self.spec.group_ratio / max(1e-9, 1 - self.spec.group_ratio))
+        for g in range(groups):
+            threads.append(r.sample(range(self.spec.addresses), min(self.spec.addresses, r.randint(2, 8))))
+        return threads
+
+    def _body(self):
+        r = self.random
+        dist = self.spec.body_dist
+        mean = self.spec.body_length
+        if dist == "fixed":
+            length = mean
+        elif dist == "lognormal":
+            length = int(r.lognormvariate(math.log(mean) - 0.5, 1.0))
+        else:
+            length = int(r.expovariate(1.0 / mean))
+        length = max(1, min(length, 5000))
+        if r.random() < self.spec.unicode_ratio:
+            corpus = self.unicodeCorpus
+        else:
+            corpus = self.corpus
+        start = r.randrange(len(corpus) - length)
+        return corpus[start:start + length].strip() or corpus[start]
+
+    def _name(self):
+        r = self.random
+        if r.random() < self.spec.unicode_ratio:
+            first = r.choice(UNICODE_NAMES)
+        else:
+            first = r.choice(FIRST_NAMES)
+        return u"%s %s" % (first, r.choice(LAST_NAMES))
+
+    def _corpus(self, words, size):
+        r = random.Random(self.spec.seed)
+        parts = []
+        length = 0
+        while length < size:
+            word = r.choice(words)
+            parts.append(word)
+            length += len(word) + 1
+        return u" ".join(parts)
+
+    def _create(self, path, schema):
+        if os.path.exists(path):
+            os.remove(path)
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.executescript(schema)
+        return conn
+
+    def _batches(self, rows):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= BATCH:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+
+"""Writes the databases of a device generated from spec to directory, returns the rows written to each"""
+def generateDevice(directory, spec):
+    return DeviceWriter(spec).write(directory)
+
+
+"""Returns count message bodies drawn the way generateDevice draws them for spec"""
+def messageBodies(spec, count):
+    writer = DeviceWriter(spec)
+    return [writer._body() for i in range(count)]
+
+
+"""Adds the options describing a DeviceSpec to an argparse parser"""
+def addSpecArguments(parser):
+    parser.add_argument("--fb-messages", type=int, help="facebook messenger rows to write (default: same as sms)")
+    parser.add_argument("--addresses", type=int, help="distinct numbers/users talked to (default: sqrt of messages)")
+    parser.add_argument("--contact-ratio", type=float, default=0.6, help="share of addresses saved as contacts (default: %(default)s)")
+    parser.add_argument("--body-length", type=int, default=60, help="mean message length in characters (default: %(default)s)")
+    parser.add_argument("--body-dist", choices=("exp", "lognormal", "fixed"), default="exp", help="message length distribution (default: %(default)s)")
+    parser.add_argument("--unicode", type=float, default=0.1, dest="unicode_ratio", help="share of messages with non latin-1 text (default: %(default)s)")
+    parser.add_argument("--group-ratio", type=float, default=0.1, help="share of group threads (default: %(default)s)")
+    parser.add_argument("--junk-ratio", type=float, default=0.01, help="share of rows the parsers should skip (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=1)
+
+
+"""Returns the DeviceSpec for parsed options and a message count"""
+def specFromArguments(args, messages):
+    return DeviceSpec(messages=messages, fb_messages=args.fb_messages, addresses=args.addresses,
+                      contact_ratio=args.contact_ratio, body_length=args.body_length, body_dist=args.body_dist,
+                      unicode_ratio=args.unicode_ratio, group_ratio=args.group_ratio, junk_ratio=args.junk_ratio,
+                      seed=args.seed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write synthetic mmssms.db, contacts2.db and threads_db2 databases.")
+    parser.add_argument("directory", help="directory to write the databases to")
+    parser.add_argument("--messages", type=int, default=10000, help="sms rows to write (default: %(default)s)")
+    addSpecArguments(parser)
+    args = parser.parse_args(argv)
+    counts = generateDevice(args.directory, specFromArguments(args, args.messages))
+    for name in sorted(counts):
+        print("%s: %d rows" % (name, counts[name]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+import os
+import time
+import threading
+try:
+    from java import io
+    from org.sleuthkit.autopsy.datamodel import ContentUtils
+except ImportError:
+    # running outside Autopsy (see HeadlessRunner.py)
+    from Standalone import io
+    from Standalone import ContentUtils
+
+
+
+"""Copies of case files kept in a directory (under the case temp directory) between reports, so a database that was
+already extracted is not written out again.  A copy is named after the file object id and a key of its content (the
+MD5 Autopsy computed for it if there is one, else its size and modification time), so a copy is only reused for the
+same file with the same content.  Once the copies add up to more than maxBytes the least recently used ones are
+deleted, never one handed out by this cache object (it may still be being parsed).  Partial copies left behind by a
+run that did not finish (older than this cache object) are deleted too, the others count against maxBytes."""
+
+class TempCopyCache():
+    def __init__(self, directory, maxBytes):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.inUse = set()          # names handed out by copy
+        self.started = time.time()  # partial copies older than this were left by an earlier run
+        self.lock = threading.Lock()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    """Returns the key of the content of file (an AbstractFile) that goes in the name of its copy"""
+    def contentKey(self, file):
+        md5 = file.getMd5Hash()
+        if md5:
+            return md5
+        return "%x-%x" % (file.getSize(), file.getMtime())
+
+    """Returns (path of a copy of file, whether it was already there).  The copy is written under a temporary name and
+    then renamed, so a copy that was cut short is never reused."""
+    def copy(self, file):
+        name = "%s-%s-%s" % (file.getId(), self.contentKey(file), file.getName())
+        path = os.path.join(self.directory, name)
+        with self.lock:
+            self.inUse.add(name)
+        reused = os.path.isfile(path) and os.path.getsize(path) == file.getSize()
+        if reused:
+            os.utime(path, None)            # most recently used
+        else:
+            partial = path + ".part"
+            ContentUtils.writeToFile(file, io.File(partial))
+            if os.path.exists(path):
+                os.remove(path)
+            os.rename(partial, path)
+        self.evict()
+        return path, reused
+
+    """Deletes the partial copies left by earlier runs, then the least recently used copies not in use until the
+    copies add up to at most maxBytes"""
+    def evict(self):
+        with self.lock:
+            copies = []
+            total = 0
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if name.endswith(".part"):
+                    try:
+                        # being written (renamed once done), else left behind by a run that did not finish
+                        size = os.path.getsize(path)
+                        if name[:-len(".part")] not in self.inUse and os.path.getmtime(path) < self.started:
+                            os.remove(path)
+                            continue
+                    except OSError:
+                        continue
+                    total += size
+                    continue
+                if not os.path.isfile(path):
+                    continue
+                size = os.path.getsize(path)
+                total += size
+                if name not in self.inUse:
+                    copies.append((os.path.getmtime(path), size, path))
+            copies.sort()
+            for mtime, size, path in copies:
+                if total <= self.maxBytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass                    # still open somewhere, try again next time
@@ -0,0 +1,57 @@
+class RenderContext():
+    # text styles used by transcripts: (font family, font style, font size, text color)
+    DB_HEADER = ("Arial", "B", 18, (0, 0, 0))
+    CONVO_HEADER = ("Arial", "B", 12, (0, 0, 0))
+    PERSON1_SENDER = ("Arial", "BU", 10, (0, 0, 100))         # dark blue
+    PERSON2_SENDER = ("Arial", "BU", 10, (100, 0, 0))         # dark red
+    PERSON1_CONTENT = ("Arial", "", 10, (0, 0, 200))          # light blue
+    PERSON2_CONTENT = ("Arial", "", 10, (200, 0, 0))          # light red
+    DATE = ("Arial", "I", 10, (100,))                         # grey
+    ERROR = ("Arial", "", 10, (0, 0, 0))
+    CONVO_ERROR = ("Arial", "B", 12, (0, 0, 0))
+    STYLES = (DB_HEADER, CONVO_HEADER, PERSON1_SENDER, PERSON2_SENDER, PERSON1_CONTENT, PERSON2_CONTENT, DATE, ERROR,
+              CONVO_ERROR)
+
+
+    def __init__(self, pdf):
+        self.pdf = pdf                  # FPDF object being written to
+        self.currentFont = None         # (family, style, size) last selected on pdf through this context
+        self.currentColor = None        # text color last selected on pdf through this context
+        self.labels = {}                # Contact -> label to print for it
+
+
+    """Selects one of the styles above on the pdf, only calling into it for the parts (font, color) that actually
+    change.  Assumes nothing else changes the pdf font or text color while this context is in use."""
+    def setStyle(self, style):
+        font = style[:3]
+        if font != self.currentFont:
+            self.pdf.set_font(*font)
+            self.currentFont = font
+        color = style[3]
+        if color != self.currentColor:
+            self.pdf.set_text_color(*color)
+            self.currentColor = color
+
+
+    """Returns the label printed for a message sender (name or identifier, encoded for the pdf), computed once per contact"""
+    def senderLabel(self, contact):
+        label = self.labels.get(contact)
+        if label is None:
+            label = self.encode(contact.getNameOrIdentifier())
+            self.labels[contact] = label
+        return label
+
+
+    """Converts header text (names and identifiers) to what the pdf core fonts can print: latin-1 characters kept as
+    they are, anything else shown as '?'"""
+    def encodeHeader(self, text):
+        if not isinstance(text, bytes):
+            text = text.encode('latin-1', 'replace')
+            if str is not bytes:
+                text = text.decode('latin-1')     # python 3 fpdf takes text, only latin-1 characters left in it
+        return text
+
+
+    """Converts text to what the pdf core fonts can print (latin-1), dropping what they cant"""
+    def encode(self, text):
+        return text.encode('utf-8').decode('latin-1', errors='ignore')
@@ -0,0 +1,96 @@
+import threading
+import traceback
+try:
+    from Queue import Queue
+    from Queue import Empty
+except ImportError:
+    from queue import Queue
+    from queue import Empty
+
+
+
+"""Returns the number of processors available (through Java when running in Jython)"""
+def cpuCount():
+    try:
+        from java.lang import Runtime
+        return Runtime.getRuntime().availableProcessors()
+    except ImportError:
+        import multiprocessing
+        return multiprocessing.cpu_count()
+
+
+
+"""Runs a function over a list of items on a bounded number of threads, the items taken in order.  The results are
+handed back in that order by the caller's own means: each item gets a Pipe, drained one after the other."""
+
+class OrderedWorkerPool():
+    def __init__(self, workers):
+        self.workers = max(1, workers)
+
+    """Starts fn(item) for each item on the workers (taking the items in order) and returns without waiting for them.
+    fn hands its results over by its own means (see Pipe); an exception it lets out ends only its item, and is handed
+    to onError(item, exception) while it is being handled (printed when there is no onError)."""
+    def spawn(self, fn, items, onError=None):
+        items = list(items)
+        lock = threading.Lock()
+        state = {"next": 0}
+
+        def work():
+            while True:
+                with lock:
+                    i = state["next"]
+                    state["next"] += 1
+                if i >= len(items):
+                    return
+                try:
+                    fn(items[i])
+                except Exception as e:
+                    if onError is None:
+                        traceback.print_exc()
+                    else:
+                        onError(items[i], e)
+
+        threads = [threading.Thread(target=work) for i in range(min(self.workers, len(items)))]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        return threads
+
+
+
+"""A bounded queue from one producer to one consumer: the producer puts items then closes it, the consumer iterates
+over them until it is closed.  put blocks while maxsize items are waiting, so a slow consumer holds the producer
+back instead of items piling up.  A consumer that does not want the rest of the items stops the pipe."""
+
+class Pipe():
+    _closed = object()
+
+    def __init__(self, maxsize):
+        self.queue = Queue(maxsize)
+        self.stopped = False
+
+    """Puts item for the consumer, returns False (dropping it) once the consumer stopped the pipe"""
+    def put(self, item):
+        if self.stopped:
+            return False
+        self.queue.put(item)
+        return True
+
+    """Consumer side: drops the items waiting and refuses any more, so the producer can give up early"""
+    def stop(self):
+        self.stopped = True
+        try:
+            while True:
+                self.queue.get_nowait()
+        except Empty:
+            pass
+
+    def close(self):
+        self.queue.put(Pipe._closed)
+
+    def __iter__(self):
+        while True:
+            item = self.queue.get()
+            if item is Pipe._closed:
+                return
+            yield item
@@ -154,3 +154,10 @@ fpdf_charwidths['zapfdingbats']={
     '\xdc':927,'\xdd':928,'\xde':928,'\xdf':834,'\xe0':873,'\xe1':828,'\xe2':924,'\xe3':924,'\xe4':917,'\xe5':930,'\xe6':931,'\xe7':463,'\xe8':883,'\xe9':836,'\xea':836,'\xeb':867,'\xec':867,'\xed':696,'\xee':696,'\xef':874,'\xf0':0,'\xf1':874,
     '\xf2':760,'\xf3':946,'\xf4':771,'\xf5':865,'\xf6':771,'\xf7':888,'\xf8':967,'\xf9':888,'\xfa':831,'\xfb':873,'\xfc':927,'\xfd':970,'\xfe':918,'\xff':0}
 
+
+def charwidth_table(cw):
+    "256-entry tuple of the widths in cw (char -> width) indexed by byte value, 0 where undefined"
+    return tuple([cw.get(chr(i), 0) for i in range(256)])
+
+# Same metrics, indexed by byte value
+fpdf_charwidth_tables = dict([(k, charwidth_table(v)) for k, v in fpdf_charwidths.items()])
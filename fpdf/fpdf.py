@@ -20,11 +20,14 @@ from functools import wraps
 import math
 import errno
 import os, sys, zlib, struct, re, tempfile, struct
+import json
+import threading
+from bisect import bisect_right
 
 from .ttfonts import TTFontFile
-from .fonts import fpdf_charwidths
+from .fonts import fpdf_charwidths, fpdf_charwidth_tables, charwidth_table
 from .php import substr, sprintf, print_r, UTF8ToUTF16BE, UTF8StringToArray
-from .py3k import PY3K, pickle, urlopen, Image, basestring, unicode, exception, b, hashpath
+from .py3k import PY3K, pickle, urlopen, Image, basestring, unicode, exception, b, hashpath, Queue, Empty
 
 # Global variables
 FPDF_VERSION = '1.7.2'
@@ -38,18 +41,154 @@ def set_global(var, val):
     globals()[var] = val
 
 
+def parallel_map(fn, items, workers):
+    "Return [fn(x) for x in items], run on up to workers threads (order kept)"
+    items = list(items)
+    workers = min(workers, len(items))
+    if workers <= 1:
+        return [fn(x) for x in items]
+    results = [None] * len(items)
+    errors = []
+    lock = threading.Lock()
+    pending = [0]
+    def run():
+        while not errors:
+            lock.acquire()
+            try:
+                i = pending[0]
+                pending[0] += 1
+            finally:
+                lock.release()
+            if i >= len(items):
+                return
+            try:
+                results[i] = fn(items[i])
+            except Exception:
+                errors.append(exception())
+    threads = [threading.Thread(target=run) for i in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if errors:
+        raise errors[0]
+    return results
+
+
+class LRUCache(object):
+    """Bounded mapping that drops the least recently used entries when full
+
+    Recency is tracked in two generations of plain dicts (entries used since
+    the last turnover survive it, the rest are dropped), which is much
+    cheaper per lookup than keeping an exact order."""
+
+    def __init__(self, size):
+        self.size = size
+        self.recent = {}
+        self.old = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        "Return the value for key (marking it recently used) or None"
+        value = self.recent.get(key)
+        if value is None:
+            value = self.old.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.put(key, value)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        "Store value (never None) for key"
+        if self.size <= 0:
+            return
+        self.recent[key] = value
+        if len(self.recent) * 2 >= self.size:
+            # turnover: entries not used since the previous one are dropped
+            self.old = self.recent
+            self.recent = {}
+
+    def clear(self):
+        self.recent = {}
+        self.old = {}
+
+    def __len__(self):
+        return len(self.recent) + len(self.old)
+
+
+class PageCompressor(object):
+    "Compresses page streams on background threads while layout carries on"
+
+    def __init__(self, workers, streams):
+        self.streams = streams              # page number -> compressed stream, filled in by the workers
+        self.queue = Queue(workers * 2)     # bounded, so raw pages cannot pile up in memory
+        self.errors = []
+        self.threads = []
+        for i in range(workers):
+            t = threading.Thread(target=self._run)
+            t.daemon = True
+            t.start()
+            self.threads.append(t)
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            n, p = item
+            try:
+                self.streams[n] = zlib.compress(p)
+            except Exception:
+                self.errors.append(exception())
+
+    def submit(self, n, p):
+        "Queue page n (latin1 bytes) for compression"
+        self.queue.put((n, p))
+
+    def join(self):
+        "Wait until every queued page is compressed"
+        for t in self.threads:
+            self.queue.put(None)
+        for t in self.threads:
+            t.join()
+        if self.errors:
+            raise self.errors[0]
+
+    def stop(self):
+        "Drop the pages still queued and wait for the threads to exit"
+        try:
+            while True:
+                self.queue.get_nowait()
+        except Empty:
+            pass
+        for t in self.threads:
+            self.queue.put(None)
+        for t in self.threads:
+            t.join()
+
+
 class FPDF(object):
     "PDF Generation class"
 
-    def __init__(self, orientation='P',unit='mm',format='A4'):
+    def __init__(self, orientation='P',unit='mm',format='A4',width_cache_size=4096):
         # Some checks
         self._dochecks()
         # Initialization of properties
+        self.width_cache=LRUCache(width_cache_size)  # string widths by font (see get_string_width)
         self.offsets={}                 # array of object offsets
         self.page=0                     # current page number
         self.n=2                        # current object number
-        self.buffer=''                  # buffer holding in-memory PDF
-        self.pages={}                   # array containing pages
+        self._buffer=[]                 # chunks of in-memory PDF (joined on demand, see buffer)
+        self._buffer_len=0              # length of in-memory PDF, used for xref offsets
+        self.pages={}                   # array containing pages (each a list of content chunks)
+        self.stream_name=None           # file the document is streamed to, if any (see set_streaming)
+        self._stream_file=None
+        self._page_streams={}           # compressed content of pages already ended
+        self._compressor=None           # background PageCompressor, when workers > 1
+        self._section=None              # section being recorded, if any (see begin_section)
         self.orientation_changes={}     # array indicating orientation changes
         self.state=0                    # current document state
         self.fonts={}                   # array of used fonts
@@ -64,6 +203,13 @@ class FPDF(object):
         self.font_family=''             # current font family
         self.font_style=''              # current font style
         self.font_size_pt=12            # current font size in points
+        self._font_out=None             # font selection last written to the page content
+        self.text_batching=0            # merge consecutive cells into one text object
+        self._textrun=None              # color of the open text object, if any (see _puttextrun)
+        self._textparts=None            # its content so far
+        self._textpos=None              # position of the last text drawn in it
+        self._textws=None               # word spacing in effect when it was opened
+        self._ws_out='0 Tw'             # word spacing last written to the page content
         self.underline=0                # underlining flag
         self.draw_color='0 G'
         self.fill_color='0 g'
@@ -140,6 +286,20 @@ class FPDF(object):
         # Set default PDF version number
         self.pdf_version='1.3'
 
+    def _getbuffer(self):
+        "In-memory PDF as a single string"
+        if len(self._buffer)>1:
+            self._buffer[:]=[''.join(self._buffer)]
+        if self._buffer:
+            return self._buffer[0]
+        return ''
+
+    def _setbuffer(self, s):
+        self._buffer=[s] if s else []
+        self._buffer_len=len(s)
+
+    buffer=property(_getbuffer, _setbuffer)
+
     def check_page(fn):
         "Decorator to protect drawing methods"
         @wraps(fn)
@@ -193,9 +353,130 @@ class FPDF(object):
         else:
             self.error('Incorrect layout display mode: '+layout)
 
-    def set_compression(self, compress):
-        "Set page compression"
+    def set_compression(self, compress, workers=1):
+        """Set page compression
+
+        Each page is compressed as soon as it ends, and only the compressed
+        stream is kept. With workers > 1 this happens on that many
+        background threads (zlib releases the GIL), and pages that must stay
+        uncompressed until close (page number aliases) are compressed in
+        parallel then."""
         self.compress=compress
+        self.workers=max(1, int(workers))
+
+    def set_text_batching(self, batching):
+        """Merge consecutive cells drawn with the same font and color into one
+        text object, positioning each with a relative move"""
+        self.text_batching=batching
+
+    def set_streaming(self, name):
+        """Write the document to file name as it is built instead of in memory
+
+        Each page's content is written out (and dropped) as soon as the
+        page ends; page dictionaries, resources and xref follow on close().
+        The document is written to name+'.part' and only renamed to name once
+        complete, so a document abandoned (see abort) leaves no partial file
+        under name. Must be called before the first page; page number aliases
+        are not available in this mode."""
+        if(self.state!=0 or self.page>0):
+            self.error('Streaming must be enabled before the first page')
+        if hasattr(self,'str_alias_nb_pages'):
+            self.error('Page number aliases are not supported when streaming')
+        f=open(name+'.part','wb')
+        if(not f):
+            self.error('Unable to create output file: '+name)
+        self.stream_name=name
+        self._stream_file=f
+        self._putheader()
+
+    def section_state(self):
+        """Drawing state the output of a section depends on (position, font,
+        colors, margins, fonts registered so far...), as a string
+
+        Drawing the same calls from the same state gives the same output, so
+        a section recorded from this state can be replayed in its place."""
+        fonts=sorted((key,font['i']) for key,font in self.fonts.items())
+        return json.dumps([self.x,self.y,self.lasth,self.font_family,self.font_style,self.font_size_pt,
+                           self.underline,self._font_out,self._ws_out,self.ws,self.draw_color,self.fill_color,
+                           self.text_color,self.color_flag,self.line_width,self.cur_orientation,self.w,self.h,
+                           self.l_margin,self.t_margin,self.r_margin,self.b_margin,self.c_margin,
+                           self.auto_page_break,self.k,self.compress,self.text_batching,fonts])
+
+    def begin_section(self, name):
+        """Record everything drawn until end_section to file name, to be
+        replayed later with replay_section
+
+        Pages begun and ended within the section are kept as their final
+        (compressed) streams.  header() and footer() output is recorded like
+        the rest, so they must not depend on the page number."""
+        if(self.state!=2):
+            self.error('No page open, you need to call add_page() first')
+        if self._section is not None:
+            self.error('Sections cannot be nested')
+        if hasattr(self,'str_alias_nb_pages'):
+            self.error('Page number aliases are not supported in sections')
+        if self._textrun is not None:
+            self._endtextrun()
+        f=open(name,'wb')
+        self._section={'file':f,'offset':len(self.pages[self.page]),'first':True}
+        self._putsection('S',self.section_state())
+
+    def end_section(self):
+        "Finish recording the section begun by begin_section"
+        section=self._section
+        if section is None:
+            self.error('No section is being recorded')
+        if self._textrun is not None:
+            self._endtextrun()
+        if section['first']:
+            self._putsection('A',''.join(self.pages[self.page][section['offset']:]))
+        else:
+            self._putsection('A',''.join(self.pages[self.page]))
+        fonts=[[key,font['i']] for key,font in self.fonts.items()]
+        self._putsection('E',json.dumps([json.loads(self.section_state()),fonts]))
+        section['file'].close()
+        self._section=None
+
+    def replay_section(self, name):
+        """Draw the section recorded in file name (see begin_section), as if
+        its calls were made again; the current state must be the one it was
+        recorded from.  The file is checked to be complete before anything
+        is drawn: a RuntimeError then means nothing was drawn."""
+        if self._section is not None:
+            self.error('Sections cannot be replayed while recording one')
+        if self._textrun is not None:
+            self._endtextrun()
+        try:
+            f=open(name,'rb')
+        except EnvironmentError:
+            self.error('Unable to open section: '+name)
+        try:
+            try:
+                records=list(self._readsection(f, 'SE'))
+                if(not records or records[0][0]!='S' or records[-1][0]!='E' or f.tell()!=os.fstat(f.fileno()).st_size):
+                    self.error('Incomplete section: '+name)
+                if(records[0][1].decode('latin1')!=self.section_state()):
+                    self.error('Section was recorded from another state: '+name)
+                state,fonts=json.loads(records[-1][1].decode('latin1'))
+                if(len(state)<15 or [key for key,i in fonts if key not in self.fonts and key not in self.core_fonts]):
+                    self.error('Corrupt section: '+name)
+                f.seek(0)
+            except (ValueError,TypeError,EnvironmentError):
+                self.error('Corrupt section: '+name)
+            for tag,data in self._readsection(f, 'ANPE'):
+                if tag=='A':
+                    if data:
+                        self.pages[self.page].append(data.decode('latin1') if PY3K else data)
+                elif tag=='N':
+                    self._endpage()
+                    self._beginpage('')
+                elif tag=='P':
+                    #Final content of the page just begun
+                    self._page_streams[self.page]=data
+                elif tag=='E':
+                    self._setsectionstate(state,fonts)
+        finally:
+            f.close()
 
     def set_title(self, title):
         "Title of document"
@@ -218,7 +499,15 @@ class FPDF(object):
         self.creator=creator
 
     def alias_nb_pages(self, alias='{nb}'):
-        "Define an alias for total number of pages"
+        """Define an alias for total number of pages
+
+        Pages keep their content uncompressed until close from then on; as
+        pages already ended may have been compressed or written out, it must
+        be defined before the first page ends, and not when streaming."""
+        if self._stream_file is not None:
+            self.error('Page number aliases are not supported when streaming')
+        if [n for n in range(1,self.page+1) if self.pages[n] is None]:
+            self.error('Page number aliases must be defined before the first page ends')
         self.str_alias_nb_pages=alias
         return alias
 
@@ -230,6 +519,25 @@ class FPDF(object):
         "Begin document"
         self.state=1
 
+    def abort(self):
+        """Abandon the document (when it will not be closed, after an error):
+        stop background compression, close the files being written and
+        delete the partial streamed document"""
+        if self._compressor is not None:
+            self._compressor.stop()
+            self._compressor=None
+        if self._section is not None:
+            self._section['file'].close()
+            self._section=None
+        if self._stream_file is not None:
+            self._stream_file.close()
+            self._stream_file=None
+            try:
+                os.remove(self.stream_name+'.part')
+            except OSError:
+                pass
+        self.state=3
+
     def close(self):
         "Terminate document"
         if(self.state==3):
@@ -305,6 +613,26 @@ class FPDF(object):
         self.text_color=tc
         self.color_flag=cf
 
+    def add_fresh_page(self, orientation=''):
+        """Start a new page in the drawing state a document starts in (no font
+        selected, default colors and line width), whatever was drawn before
+
+        With the same fonts registered, what follows is drawn the same (see
+        section_state) wherever it comes in the document."""
+        self.font_family=''
+        self.font_style=''
+        self.font_size_pt=12
+        self.font_size=self.font_size_pt/self.k
+        self.underline=0
+        self.draw_color='0 G'
+        self.fill_color='0 g'
+        self.text_color='0 g'
+        self.color_flag=0
+        self.line_width=.567/self.k
+        self.lasth=0
+        self.ws=0
+        self.add_page(orientation)
+
     def header(self):
         "Header to be implemented in your own inherited class"
         pass
@@ -347,9 +675,19 @@ class FPDF(object):
     def get_string_width(self, s):
         "Get width of a string in the current font"
         s = self.normalize_text(s)
+        if self.width_cache.size<=0:
+            return self._measure(s)*self.font_size/1000.0
+        key=(self.current_font['i'],s)
+        w=self.width_cache.get(key)
+        if w is None:
+            w=self._measure(s)
+            self.width_cache.put(key,w)
+        return w*self.font_size/1000.0
+
+    def _measure(self, s):
+        "Width of s in the current font, in 1/1000 of the font size"
         cw=self.current_font['cw']
         w=0
-        l=len(s)
         if self.unifontsubset:
             for char in s:
                 char = ord(char)
@@ -362,9 +700,20 @@ class FPDF(object):
                 else:
                     w += 500
         else:
-            for i in range(0, l):
-                w += cw.get(s[i],0)
-        return w*self.font_size/1000.0
+            w = sum(self._charwidths(s))
+        return w
+
+    def _charwidths(self, s):
+        "Widths of each character of s in the current (non unicode) font"
+        cwt=self.current_font.get('cwt')
+        if cwt is not None:
+            # bulk lookup by byte value instead of a dict lookup per character
+            try:
+                return map(cwt.__getitem__, s.encode('latin1') if PY3K else bytearray(s))
+            except UnicodeEncodeError:
+                pass
+        cw=self.current_font['cw']
+        return [cw.get(c,0) for c in s]
 
     def set_line_width(self, width):
         "Set line width"
@@ -455,6 +804,7 @@ class FPDF(object):
         if fontkey in self.fonts:
             # Font already added!
             return
+        self.width_cache.clear()
         if (uni):
             global SYSTEM_TTFONTS, FPDF_CACHE_MODE, FPDF_CACHE_DIR
             if os.path.exists(fname):
@@ -587,20 +937,7 @@ class FPDF(object):
         #Test if used for the first time
         fontkey=family+style
         if fontkey not in self.fonts:
-            #Check if one of the standard fonts
-            if fontkey in self.core_fonts:
-                if fontkey not in fpdf_charwidths:
-                    #Load metric file
-                    name=os.path.join(FPDF_FONT_DIR,family)
-                    if(family=='times' or family=='helvetica'):
-                        name+=style.lower()
-                    exec(compile(open(name+'.font').read(), name+'.font', 'exec'))
-                    if fontkey not in fpdf_charwidths:
-                        self.error('Could not include font metric file for'+fontkey)
-                i=len(self.fonts)+1
-                self.fonts[fontkey]={'i':i,'type':'core','name':self.core_fonts[fontkey],'up':-100,'ut':50,'cw':fpdf_charwidths[fontkey]}
-            else:
-                self.error('Undefined font: '+family+' '+style)
+            self._addcorefont(family,style)
         #Select it
         self.font_family=family
         self.font_style=style
@@ -608,8 +945,26 @@ class FPDF(object):
         self.font_size=size/self.k
         self.current_font=self.fonts[fontkey]
         self.unifontsubset = (self.fonts[fontkey]['type'] == 'TTF')
-        if(self.page>0):
-            self._out(sprintf('BT /F%d %.2f Tf ET',self.current_font['i'],self.font_size_pt))
+
+    def _addcorefont(self, family, style):
+        #Register one of the standard fonts, on its first use
+        fontkey=family+style
+        if fontkey in self.core_fonts:
+            if fontkey not in fpdf_charwidths:
+                #Load metric file
+                name=os.path.join(FPDF_FONT_DIR,family)
+                if(family=='times' or family=='helvetica'):
+                    name+=style.lower()
+                exec(compile(open(name+'.font').read(), name+'.font', 'exec'))
+                if fontkey not in fpdf_charwidths:
+                    self.error('Could not include font metric file for'+fontkey)
+            if fontkey not in fpdf_charwidth_tables:
+                fpdf_charwidth_tables[fontkey]=charwidth_table(fpdf_charwidths[fontkey])
+            i=len(self.fonts)+1
+            self.fonts[fontkey]={'i':i,'type':'core','name':self.core_fonts[fontkey],'up':-100,'ut':50,'cw':fpdf_charwidths[fontkey],
+                                 'cwt':fpdf_charwidth_tables[fontkey]}
+        else:
+            self.error('Undefined font: '+family+' '+style)
 
     def set_font_size(self, size):
         "Set font size in points"
@@ -617,8 +972,14 @@ class FPDF(object):
             return
         self.font_size_pt=size
         self.font_size=size/self.k
-        if(self.page>0):
-            self._out(sprintf('BT /F%d %.2f Tf ET',self.current_font['i'],self.font_size_pt))
+
+    def _putfont(self):
+        #Select the current font in the page content, unless already selected
+        #(done lazily, when text is drawn, so font switches without text cost nothing)
+        font=(self.current_font['i'],self.font_size_pt)
+        if(self._font_out!=font):
+            self._font_out=font
+            self._out(sprintf('/F%d %.2f Tf',font[0],font[1]))
 
     def add_link(self):
         "Create a new internal link"
@@ -644,6 +1005,7 @@ class FPDF(object):
     def text(self, x, y, txt=''):
         "Output a string"
         txt = self.normalize_text(txt)
+        self._putfont()
         if (self.unifontsubset):
             txt2 = self._escape(UTF8ToUTF16BE(txt, False))
             for uni in UTF8StringToArray(txt):
@@ -665,6 +1027,7 @@ class FPDF(object):
             y = self.y;
         if self.angle!=0:
             self._out('Q')
+            self._font_out=None     # Q restored the font in use before the rotation
         self.angle = angle
         if angle!=0:
             angle *= math.pi/180;
@@ -690,12 +1053,12 @@ class FPDF(object):
             ws=self.ws
             if(ws>0):
                 self.ws=0
-                self._out('0 Tw')
+                self._putws('0 Tw')
             self.add_page(self.cur_orientation)
             self.x=x
             if(ws>0):
                 self.ws=ws
-                self._out(sprintf('%.3f Tw',ws*k))
+                self._putws(sprintf('%.3f Tw',ws*k))
         if(w==0):
             w=self.w-self.r_margin-self.x
         s=''
@@ -720,13 +1083,15 @@ class FPDF(object):
             if('B' in border):
                 s+=sprintf('%.2f %.2f m %.2f %.2f l S ',x*k,(self.h-(y+h))*k,(x+w)*k,(self.h-(y+h))*k)
         if(txt!=''):
+            self._putfont()
             if(align=='R'):
                 dx=w-self.c_margin-self.get_string_width(txt)
             elif(align=='C'):
                 dx=(w-self.get_string_width(txt))/2.0
             else:
                 dx=self.c_margin
-            if(self.color_flag):
+            batch=self.text_batching and not s and not self.underline and not (self.ws and self.unifontsubset)
+            if(self.color_flag and not batch):
                 s+='q '+self.text_color+' '
 
             # If multibyte, Tw has no effect - do word spacing using an adjustment before each space
@@ -753,11 +1118,14 @@ class FPDF(object):
                         self.current_font['subset'].append(uni)
                 else:
                     txt2 = self._escape(txt)
-                s += sprintf('BT %.2f %.2f Td (%s) Tj ET',(self.x+dx)*k,(self.h-(self.y+.5*h+.3*self.font_size))*k,txt2)
+                if batch:
+                    self._puttextrun((self.x+dx)*k,(self.h-(self.y+.5*h+.3*self.font_size))*k,txt2)
+                else:
+                    s += sprintf('BT %.2f %.2f Td (%s) Tj ET',(self.x+dx)*k,(self.h-(self.y+.5*h+.3*self.font_size))*k,txt2)
 
             if(self.underline):
                 s+=' '+self._dounderline(self.x+dx,self.y+.5*h+.3*self.font_size,txt)
-            if(self.color_flag):
+            if(self.color_flag and not batch):
                 s+=' Q'
             if(link):
                 self.link(self.x+dx,self.y+.5*h-.5*self.font_size,self.get_string_width(txt),self.font_size,link)
@@ -777,7 +1145,6 @@ class FPDF(object):
         "Output text with automatic or explicit line breaks"
         txt = self.normalize_text(txt)
         ret = [] # if split_only = True, returns splited text cells
-        cw=self.current_font['cw']
         if(w==0):
             w=self.w-self.r_margin-self.x
         wmax=(w-2*self.c_margin)*1000.0/self.font_size
@@ -801,99 +1168,134 @@ class FPDF(object):
                     b=b2+'T'
                 else:
                     b=b2
-        sep=-1
-        i=0
-        j=0
-        l=0
-        ns=0
         nl=1
-        while(i<nb):
-            #Get next character
-            c=s[i]
-            if(c=="\n"):
-                #Explicit line break
+        lines=self._breaklines(s,nb,wmax)
+        for j,i,sep,ls,ns in lines[:-1]:
+            if(sep==-1):
+                #Explicit or forced line break
                 if(self.ws>0):
                     self.ws=0
                     if not split_only:
-                        self._out('0 Tw')
-                if not split_only:
-                    self.cell(w,h,substr(s,j,i-j),b,2,align,fill)
-                else:
-                    ret.append(substr(s,j,i-j))
-                i+=1
-                sep=-1
-                j=i
-                l=0
-                ns=0
-                nl+=1
-                if(border and nl==2):
-                    b=b2
-                continue
-            if(c==' '):
-                sep=i
-                ls=l
-                ns+=1
-            if self.unifontsubset:
-                l += self.get_string_width(c) / self.font_size*1000.0
-            else:
-                l += cw.get(c,0)
-            if(l>wmax):
-                #Automatic line break
-                if(sep==-1):
-                    if(i==j):
-                        i+=1
-                    if(self.ws>0):
-                        self.ws=0
-                        if not split_only:
-                            self._out('0 Tw')
-                    if not split_only:
-                        self.cell(w,h,substr(s,j,i-j),b,2,align,fill)
-                    else:
-                        ret.append(substr(s,j,i-j))
+                        self._putws('0 Tw')
+            elif(align=='J'):
+                #Automatic line break at a space
+                if ns>1:
+                    self.ws=(wmax-ls)/1000.0*self.font_size/(ns-1)
                 else:
-                    if(align=='J'):
-                        if ns>1:
-                            self.ws=(wmax-ls)/1000.0*self.font_size/(ns-1)
-                        else:
-                            self.ws=0
-                        if not split_only:
-                            self._out(sprintf('%.3f Tw',self.ws*self.k))
-                    if not split_only:
-                        self.cell(w,h,substr(s,j,sep-j),b,2,align,fill)
-                    else:
-                        ret.append(substr(s,j,sep-j))
-                    i=sep+1
-                sep=-1
-                j=i
-                l=0
-                ns=0
-                nl+=1
-                if(border and nl==2):
-                    b=b2
+                    self.ws=0
+                if not split_only:
+                    self._putws(sprintf('%.3f Tw',self.ws*self.k))
+            if not split_only:
+                self.cell(w,h,s[j:i],b,2,align,fill)
             else:
-                i+=1
+                ret.append(s[j:i])
+            nl+=1
+            if(border and nl==2):
+                b=b2
         #Last chunk
+        j,i=lines[-1][:2]
         if(self.ws>0):
             self.ws=0
             if not split_only:
-                self._out('0 Tw')
+                self._putws('0 Tw')
         if(border and 'B' in border):
             b+='B'
         if not split_only:
-            self.cell(w,h,substr(s,j,i-j),b,2,align,fill)
+            self.cell(w,h,s[j:i],b,2,align,fill)
             self.x=self.l_margin
         else:
-            ret.append(substr(s,j,i-j))
+            ret.append(s[j:i])
         return ret
 
+    def _breaklines(self, s, nb, wmax):
+        """Split s[:nb] into lines no wider than wmax (in 1/1000 of the font size)
+
+        Returns a list of (start, end, sep, ls, ns), one per line s[start:end].
+        sep is the index of the space the line was wrapped at, or -1 for an
+        explicit ("\\n") or forced (no space) break; ls is the width before
+        that space and ns the number of spaces up to it. The last line is
+        always the remainder of the text.
+
+        Each paragraph is measured as a whole and only searched for a break
+        point when it does not fit: with core fonts by bisecting exact integer
+        running sums, with unicode fonts by summing cached character widths in
+        the same order as a character by character scan would."""
+        if self.unifontsubset:
+            known={}
+            cws=[]
+            for c in s[:nb]:
+                if c not in known:
+                    known[c]=self.get_string_width(c) / self.font_size*1000.0
+                cws.append(known[c])
+            exact=False
+        else:
+            cws=list(self._charwidths(s[:nb]))
+            exact=True              # integer widths, so running sums are exact
+        sums=None                   # running sums of cws, built once a paragraph does not fit
+        lines=[]
+        j=0
+        while(j<nb):
+            e=s.find("\n",j,nb)
+            if(e==-1):
+                e=nb
+            #First character that makes the line too wide (-1 if it fits)
+            i=-1
+            if exact:
+                if sums is not None:
+                    width=sums[e]-sums[j]
+                else:
+                    width=sum(cws[j:e])
+                if(e>j and width>wmax):
+                    if sums is None:
+                        sums=[0]
+                        t=0
+                        for cw in cws:
+                            t+=cw
+                            sums.append(t)
+                    i=min(bisect_right(sums,sums[j]+wmax,j+1,e+1)-1,e-1)
+                    # settle rounding of sums[j]+wmax against the exact test
+                    while(sums[i+1]-sums[j]<=wmax):
+                        i+=1
+                    while(i>j and sums[i]-sums[j]>wmax):
+                        i-=1
+            else:
+                l=0
+                for k in range(j,e):
+                    if(s[k]==' '):
+                        ls=l
+                    l+=cws[k]
+                    if(l>wmax):
+                        i=k
+                        break
+            if(i==-1):
+                if(e==nb):
+                    break
+                lines.append((j,e,-1,0,0))
+                j=e+1
+                continue
+            sep=s.rfind(' ',j,i+1)
+            if(sep==-1):
+                if(i==j):
+                    i+=1
+                lines.append((j,i,-1,0,0))
+                j=i
+            else:
+                if exact:
+                    ls=sums[sep]-sums[j]
+                lines.append((j,sep,sep,ls,s.count(' ',j,sep+1)))
+                j=sep+1
+        lines.append((j,nb,-1,0,0))
+        return lines
+
     @check_page
     def write(self, h, txt='', link=''):
         "Output text in flowing mode"
         txt = self.normalize_text(txt)
-        cw=self.current_font['cw']
         w=self.w-self.r_margin-self.x
         wmax=(w-2*self.c_margin)*1000.0/self.font_size
         s=txt.replace("\r",'')
+        if not self.unifontsubset:
+            cws=list(self._charwidths(s))
         nb=len(s)
         sep=-1
         i=0
@@ -921,7 +1323,7 @@ class FPDF(object):
             if self.unifontsubset:
                 l += self.get_string_width(c) / self.font_size*1000.0
             else:
-                l += cw.get(c,0)
+                l += cws[i]
             if(l>wmax):
                 #Automatic line break
                 if(sep==-1):
@@ -1064,6 +1466,11 @@ class FPDF(object):
         if(self.state<3):
             self.close()
         dest=dest.upper()
+        if self.stream_name is not None:
+            #Already written out by close()
+            if (dest not in ('','F')) or (name and os.path.abspath(name)!=os.path.abspath(self.stream_name)):
+                self.error('Document was streamed to file: '+self.stream_name)
+            return ''
         if(dest==''):
             if(name==''):
                 name='doc.pdf'
@@ -1117,25 +1524,33 @@ class FPDF(object):
 
     def _putpages(self):
         nb=self.page
+        if self._compressor is not None:
+            #Wait for pages still being compressed in the background
+            self._compressor.join()
+            self._compressor=None
         if hasattr(self,'str_alias_nb_pages'):
             # Replace number of pages in fonts using subsets (unicode)
+            # (pages ended before the alias was defined are already compressed)
             alias = UTF8ToUTF16BE(self.str_alias_nb_pages, False)
             r = UTF8ToUTF16BE(str(nb), False)
             for n in range(1, nb+1):
-                self.pages[n] = self.pages[n].replace(alias, r)
+                if self.pages[n] is not None:
+                    self.pages[n] = [''.join(self.pages[n]).replace(alias, r)]
             # Now repeat for no pages in non-subset fonts
             for n in range(1,nb+1):
-                self.pages[n]=self.pages[n].replace(self.str_alias_nb_pages,str(nb))
+                if self.pages[n] is not None:
+                    self.pages[n]=[''.join(self.pages[n]).replace(self.str_alias_nb_pages,str(nb))]
         if(self.def_orientation=='P'):
             w_pt=self.fw_pt
             h_pt=self.fh_pt
         else:
             w_pt=self.fh_pt
             h_pt=self.fw_pt
-        if self.compress:
-            filter='/Filter /FlateDecode '
+        if self.compress and self.workers>1 and self._stream_file is None:
+            #Compress all page streams up front on the worker pool
+            streams=parallel_map(self._pagestream, range(1,nb+1), self.workers)
         else:
-            filter=''
+            streams=None
         for n in range(1,nb+1):
             #Page
             self._newobj()
@@ -1165,18 +1580,16 @@ class FPDF(object):
             self._out('/Contents '+str(self.n+1)+' 0 R>>')
             self._out('endobj')
             #Page content
-            if self.compress:
-                # manage binary data as latin1 until PEP461 or similar is implemented
-                p = self.pages[n].encode("latin1") if PY3K else self.pages[n] 
-                p = zlib.compress(p)
+            if self._stream_file is not None:
+                #Already written when the page ended
+                self.n+=1
+            elif streams is not None:
+                self._putpagecontent(n, p=streams[n-1])
+                streams[n-1]=None
             else:
-                p = self.pages[n]
-            self._newobj()
-            self._out('<<'+filter+'/Length '+str(len(p))+'>>')
-            self._putstream(p)
-            self._out('endobj')
+                self._putpagecontent(n)
         #Pages root
-        self.offsets[1]=len(self.buffer)
+        self.offsets[1]=self._buffer_len
         self._out('1 0 obj')
         self._out('<</Type /Pages')
         kids='/Kids ['
@@ -1188,6 +1601,29 @@ class FPDF(object):
         self._out('>>')
         self._out('endobj')
 
+    def _pagestream(self, n):
+        #Page content, compressed if enabled
+        if n in self._page_streams:
+            return self._page_streams.pop(n)
+        p = ''.join(self.pages[n])
+        if self.compress:
+            # manage binary data as latin1 until PEP461 or similar is implemented
+            p = p.encode("latin1") if PY3K else p
+            p = zlib.compress(p)
+        return p
+
+    def _putpagecontent(self, n, obj=None, p=None):
+        if p is None:
+            p = self._pagestream(n)
+        if self.compress:
+            filter='/Filter /FlateDecode '
+        else:
+            filter=''
+        self._newobj(obj)
+        self._out('<<'+filter+'/Length '+str(len(p))+'>>')
+        self._putstream(p)
+        self._out('endobj')
+
     def _putfonts(self):
         nf=self.n
         for diff in self.diffs:
@@ -1584,7 +2020,7 @@ class FPDF(object):
         self._putfonts()
         self._putimages()
         #Resource dictionary
-        self.offsets[2]=len(self.buffer)
+        self.offsets[2]=self._buffer_len
         self._out('2 0 obj')
         self._out('<<')
         self._putresourcedict()
@@ -1632,7 +2068,8 @@ class FPDF(object):
         self._out('/Info '+str(self.n-1)+' 0 R')
 
     def _enddoc(self):
-        self._putheader()
+        if self._stream_file is None:
+            self._putheader()
         self._putpages()
         self._putresources()
         #Info
@@ -1648,7 +2085,7 @@ class FPDF(object):
         self._out('>>')
         self._out('endobj')
         #Cross-ref
-        o=len(self.buffer)
+        o=self._buffer_len
         self._out('xref')
         self._out('0 '+(str(self.n+1)))
         self._out('0000000000 65535 f ')
@@ -1663,11 +2100,22 @@ class FPDF(object):
         self._out(o)
         self._out('%%EOF')
         self.state=3
+        if self._stream_file is not None:
+            #Complete: put it in place of any earlier document under that name
+            self._stream_file.close()
+            self._stream_file=None
+            if os.path.exists(self.stream_name):
+                os.remove(self.stream_name)
+            os.rename(self.stream_name+'.part',self.stream_name)
 
     def _beginpage(self, orientation):
+        if self._section is not None:
+            self._putsection('N','')
         self.page+=1
-        self.pages[self.page]=''
+        self.pages[self.page]=[]
         self.state=2
+        self._font_out=None
+        self._ws_out='0 Tw'
         self.x=self.l_margin
         self.y=self.t_margin
         self.font_family=''
@@ -1695,13 +2143,99 @@ class FPDF(object):
 
     def _endpage(self):
         #End of page contents
+        if self._textrun is not None:
+            self._endtextrun()
+        if self._section is not None:
+            self._endsectionpage()
         self.state=1
-
-    def _newobj(self):
-        #Begin a new object
-        self.n+=1
-        self.offsets[self.n]=len(self.buffer)
-        self._out(str(self.n)+' 0 obj')
+        if self._stream_file is not None:
+            #Write page content now (its object number is fixed, 2 per page) and free it
+            if hasattr(self,'str_alias_nb_pages'):
+                self.error('Page number aliases are not supported when streaming')
+            self._putpagecontent(self.page, 2+2*self.page)
+            self.pages[self.page]=None
+        elif self.page in self._page_streams:
+            #Final content given already (recorded or replayed section)
+            self.pages[self.page]=None
+        elif self.compress and not hasattr(self,'str_alias_nb_pages'):
+            #Compress page content now and keep only the compressed stream
+            if self.workers>1:
+                if self._compressor is None:
+                    self._compressor=PageCompressor(self.workers, self._page_streams)
+                p=''.join(self.pages[self.page])
+                self._compressor.submit(self.page, p.encode("latin1") if PY3K else p)
+            else:
+                self._page_streams[self.page]=self._pagestream(self.page)
+            self.pages[self.page]=None
+
+    def _endsectionpage(self):
+        #Record the page ending in the section being recorded: the part drawn
+        #in the section if it began before it, else its final stream
+        section=self._section
+        if section['first']:
+            self._putsection('A',''.join(self.pages[self.page][section['offset']:]))
+            section['first']=False
+        else:
+            p=self._pagestream(self.page)
+            if PY3K and not isinstance(p, bytes):
+                p=p.encode('latin1')
+            self._page_streams[self.page]=p
+            self._putsection('P',p)
+
+    def _putsection(self, tag, data):
+        #Section record: tag, length and data
+        if PY3K and not isinstance(data, bytes):
+            data=data.encode('latin1')
+        f=self._section['file']
+        f.write(b(tag+str(len(data))+'\n'))
+        f.write(data)
+
+    def _readsection(self, f, load):
+        #Section records of file f as (tag, data), data only read for the
+        #tags in load
+        while True:
+            line=f.readline()
+            if not line:
+                return
+            if PY3K:
+                line=line.decode('latin1')
+            if(not line.endswith('\n') or line[0] not in 'SANPE'):
+                self.error('Corrupt section')
+            try:
+                size=int(line[1:])
+            except ValueError:
+                self.error('Corrupt section')
+            if line[0] in load:
+                data=f.read(size)
+                if(len(data)!=size):
+                    self.error('Corrupt section')
+            else:
+                f.seek(size,1)
+                data=None
+            yield line[0],data
+
+    def _setsectionstate(self, state, fonts):
+        #Restore the drawing state a replayed section ended in
+        for key,i in sorted(fonts,key=lambda font: font[1]):
+            if key not in self.fonts:
+                family=key.rstrip('BI')
+                self._addcorefont(family,key[len(family):])
+        (self.x,self.y,self.lasth,self.font_family,self.font_style,self.font_size_pt,
+         self.underline,font_out,self._ws_out,self.ws,self.draw_color,self.fill_color,
+         self.text_color,self.color_flag,self.line_width)=state[:15]
+        self._font_out=tuple(font_out) if font_out else font_out
+        self.font_size=self.font_size_pt/self.k
+        if self.font_family:
+            self.current_font=self.fonts[self.font_family+self.font_style]
+            self.unifontsubset=(self.current_font['type']=='TTF')
+
+    def _newobj(self, n=None):
+        #Begin a new object (or object n, when numbered ahead of time)
+        if n is None:
+            self.n+=1
+            n=self.n
+        self.offsets[n]=self._buffer_len
+        self._out(str(n)+' 0 obj')
 
     def _dounderline(self, x,y,txt):
         #Underline text
@@ -1903,8 +2437,48 @@ class FPDF(object):
         self._out(s)
         self._out('endstream')
 
+    def _puttextrun(self, x, y, txt):
+        #Draw escaped txt at (x,y) as part of the open text object, opening one
+        #if there is none or it has another color (a font change closes it, see _out)
+        color=self.text_color if self.color_flag else ''
+        pos=(round(x,2),round(y,2))
+        if(self._textrun==color):
+            self._textparts.append(sprintf('%.2f %.2f Td (%s) Tj',pos[0]-self._textpos[0],pos[1]-self._textpos[1],txt))
+        else:
+            if self._textrun is not None:
+                self._endtextrun()
+            self._textparts=[sprintf('BT %.2f %.2f Td (%s) Tj',pos[0],pos[1],txt)]
+            self._textrun=color
+            self._textws=self._ws_out
+        self._textpos=pos
+
+    def _endtextrun(self):
+        #Write out the open text object (kept back until it is closed)
+        color=self._textrun
+        self._textrun=None
+        s='\n'.join(self._textparts)
+        self._textparts=None
+        if color:
+            self._out('q '+color+' '+s+' ET Q')
+            if(self._ws_out!=self._textws):
+                #Q also undid the word spacing set inside it
+                self._out(self._ws_out)
+        else:
+            self._out(s+' ET')
+
+    def _putws(self, s):
+        #Set word spacing (a text state operator, allowed inside the open text object)
+        self._ws_out=s
+        if self._textrun is not None:
+            self._textparts.append(s)
+        else:
+            self._out(s)
+
     def _out(self, s):
         #Add a line to the document
+        if self._textrun is not None:
+            #Anything but text ends the open text object
+            self._endtextrun()
         if PY3K and isinstance(s, bytes):
             # manage binary data as latin1 until PEP461-like function is implemented
             s = s.decode("latin1")          
@@ -1912,10 +2486,15 @@ class FPDF(object):
             s = s.encode("latin1")    # default encoding (font name and similar)      
         elif not isinstance(s, basestring):
             s = str(s)
+        # append-only chunks: growing one big string is quadratic on some runtimes (Jython)
         if(self.state==2):
-            self.pages[self.page]+=s+"\n"
+            self.pages[self.page].append(s+"\n")
+        elif self._stream_file is not None:
+            self._stream_file.write((s+"\n").encode("latin1") if PY3K else s+"\n")
+            self._buffer_len+=len(s)+1
         else:
-            self.buffer+=s+"\n"
+            self._buffer.append(s+"\n")
+            self._buffer_len+=len(s)+1
 
     @check_page
     def interleaved2of5(self, txt, x, y, w=1.0, h=10.0):
@@ -12,6 +12,11 @@ try:
 except ImportError:
     import pickle
 
+try:
+    from Queue import Queue, Empty
+except ImportError:
+    from queue import Queue, Empty
+
 try:
 	from urllib import urlopen
 except ImportError:
@@ -0,0 +1,107 @@
+"""
+Tests for ColumnarConversation: the same conversations as Conversation, whether parsed or loaded from the parse cache.
+
+    python -m unittest discover -s tests
+"""
+
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import SyntheticDevice
+from util import Contact
+from util import Conversation
+from util import ColumnarConversation
+from ParseCache import ParseCache
+from ConversationExtractorModule import ConversationExtractorModule
+
+
+
+"Returns what a conversation holds, contacts by identifier (so conversations from different parses compare equal)"
+def contents(conversation):
+    def contact(c):
+        return None if c is None else (c.id, c.name)
+    return (contact(conversation.person1), contact(conversation.person2),
+            [(contact(m.sender), contact(m.receiver), m.timestamp, m.date_sent, m.content) for m in conversation.messages])
+
+
+
+class ColumnarConversationTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        spec = SyntheticDevice.DeviceSpec(messages=300, addresses=12, group_ratio=0.3, junk_ratio=0.05, seed=3)
+        SyntheticDevice.generateDevice(cls.directory, spec)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    "Returns the conversations parsed out of the device's target_name, columnar or not"
+    def parse(self, target_name, columnar):
+        module = ConversationExtractorModule()
+        module.columnarConversations = columnar
+        msgParser = module.getParser(target_name, None, self.directory)
+        return msgParser, list(msgParser.iterParse(os.path.join(self.directory, target_name)))
+
+    def testParticipantsFilledInLater(self):
+        first, second, other = Contact("1"), Contact("2"), Contact("3")
+        conversation = ColumnarConversation(None, None)
+        conversation.add(None, first, 10, "to first, before it is a participant")
+        conversation.person1 = first
+        conversation.add(first, None, 20, "from first")
+        conversation.add(second, None, 30, "from second, before it is a participant")
+        conversation.person2 = second
+        conversation.add(second, other, 40, "from second")
+        self.assertIs(conversation.contacts[1], first)
+        self.assertIs(conversation.contacts[2], second)
+        self.assertEqual(conversation.countFrom(first), 1)
+        self.assertEqual(conversation.countFrom(second), 2)
+        self.assertEqual([(m.sender, m.receiver) for m in conversation.messages],
+                         [(None, first), (first, None), (second, None), (second, other)])
+
+        # replacing a participant leaves the messages it sent alone
+        conversation.person2 = other
+        self.assertEqual([(m.sender, m.receiver) for m in conversation.messages],
+                         [(None, first), (first, None), (second, None), (second, other)])
+        self.assertEqual(conversation.countFrom(second), 2)
+        self.assertEqual(conversation.countFrom(other), 0)
+
+    def testFacebookParse(self):
+        msgParser, plain = self.parse("threads_db2", False)
+        msgParser, columnar = self.parse("threads_db2", True)
+        self.assertTrue(plain)
+        self.assertTrue(all(isinstance(c, ColumnarConversation) for c in columnar))
+        self.assertEqual([contents(c) for c in columnar], [contents(c) for c in plain])
+        for conversation in columnar:
+            self.assertIs(conversation.contacts[1], conversation.person1)
+            self.assertIs(conversation.contacts[2], conversation.person2)
+
+    def testParseCacheKeepsConversationType(self):
+        cacheDir = tempfile.mkdtemp()
+        try:
+            parseCache = ParseCache(cacheDir)
+            for target_name in ("threads_db2", "mmssms.db"):
+                msgParser, plain = self.parse(target_name, False)
+                msgParser, columnar = self.parse(target_name, True)
+                db_path = os.path.join(self.directory, target_name)
+                key = parseCache.key(msgParser, db_path)
+                stored = list(parseCache.store(key, msgParser.iterParse(db_path)))
+                loaded = list(parseCache.load(key, msgParser.contacts, msgParser.conversationType))
+                self.assertTrue(all(isinstance(c, ColumnarConversation) for c in loaded))
+                self.assertEqual([contents(c) for c in loaded], [contents(c) for c in plain])
+                loaded = list(parseCache.load(key))
+                self.assertTrue(all(type(c) is Conversation for c in loaded))
+                self.assertEqual([contents(c) for c in loaded], [contents(c) for c in stored])
+        finally:
+            shutil.rmtree(cacheDir)
+
+
+
+if __name__ == "__main__":
+    unittest.main()
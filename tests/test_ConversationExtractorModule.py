@@ -0,0 +1,110 @@
+"""
+Tests for ConversationExtractorModule.extractTarget: a worker gives up on its database once the report stopped its pipe,
+and an error it lets out on its worker goes to the module log.
+
+    python -m unittest discover -s tests
+"""
+
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Standalone import Level
+from WorkerPool import Pipe
+from WorkerPool import OrderedWorkerPool
+from ConversationExtractorModule import ConversationExtractorModule
+
+
+
+class FileManager():
+    def findFiles(self, dataSource, target_name):
+        return [target_name]
+
+
+class DataSource():
+    def getName(self):
+        return "device"
+
+
+"Copy cache that stops pipe (the report failing) while copying"
+class CopyCache():
+    def __init__(self, pipe):
+        self.pipe = pipe
+        self.copied = []
+
+    def copy(self, file):
+        self.copied.append(file)
+        self.pipe.stop()
+        return "/nonexistent/%s" % file, False
+
+
+class ParseCache():
+    def __init__(self):
+        self.hashed = []
+
+    def key(self, msgParser, db_path):
+        self.hashed.append(db_path)
+        return "key"
+
+
+"Parse cache that fails hashing, an error extractTarget does not expect"
+class BrokenParseCache():
+    def key(self, msgParser, db_path):
+        raise RuntimeError("cannot read %s" % db_path)
+
+
+"Logger that keeps (level, method, message) for each message"
+class RecordingLogger():
+    def __init__(self):
+        self.records = []
+
+    def isLoggable(self, level):
+        return True
+
+    def logp(self, level, sourceClass, sourceMethod, msg):
+        self.records.append((level, sourceMethod, msg))
+
+
+
+class ExtractTargetTest(unittest.TestCase):
+    "Runs extractTarget for mmssms.db with pipe, returns what it copied and hashed and what it put in pipe"
+    def extract(self, pipe, copyCache):
+        parseCache = ParseCache()
+        ConversationExtractorModule().extractTarget(None, FileManager(), copyCache, parseCache, DataSource(),
+                                                    "mmssms.db", pipe)
+        return copyCache.copied, parseCache.hashed, list(pipe)
+
+    def testStoppedBeforeCopy(self):
+        pipe = Pipe(4)
+        pipe.stop()
+        self.assertEqual(self.extract(pipe, CopyCache(pipe)), ([], [], []))
+
+    def testStoppedWhileCopying(self):
+        pipe = Pipe(4)
+        self.assertEqual(self.extract(pipe, CopyCache(pipe)), (["mmssms.db"], [], []))
+
+    def testUncaughtErrorLoggedAsSevere(self):
+        module = ConversationExtractorModule()
+        module._logger = RecordingLogger()
+        pipe = Pipe(4)
+        copyCache = CopyCache(Pipe(4))
+        threads = OrderedWorkerPool(1).spawn(
+            lambda i: module.extractTarget(None, FileManager(), copyCache, BrokenParseCache(), DataSource(), "mmssms.db", pipe),
+            [0], lambda i, e: module.logJobError(DataSource(), "mmssms.db", e))
+        for thread in threads:
+            thread.join()
+        self.assertEqual(list(pipe), [])
+        severe = [(method, msg) for level, method, msg in module._logger.records if level == Level.SEVERE]
+        self.assertEqual(len(severe), 1)
+        self.assertEqual(severe[0][0], "logJobError")
+        self.assertIn("mmssms.db from device", severe[0][1])
+        self.assertIn("cannot read /nonexistent/mmssms.db", severe[0][1])
+        self.assertIn("Traceback", severe[0][1])
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+"""
+Tests for the page handling added to FPDF: page number aliases with pages compressed or written as they end, and
+abandoning a document.
+
+    python -m unittest discover -s tests
+"""
+
+
+import os
+import re
+import sys
+import zlib
+import shutil
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fpdf.fpdf import FPDF
+
+
+
+class FPDFTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    "Returns a report with one page begun, compressed on workers if more than one"
+    def newReport(self, workers=1):
+        pdf = FPDF()
+        pdf.set_compression(1, workers)
+        pdf.add_page()
+        pdf.set_font("Arial", "", 10)
+        return pdf
+
+    "Returns the content streams of the pages of the finished document pdf, uncompressed"
+    def pageTexts(self, pdf):
+        data = pdf.output(dest="S")
+        if not isinstance(data, bytes):
+            data = data.encode("latin1")
+        texts = []
+        for match in re.finditer(br"/Length (\d+)>>\nstream\n", data):
+            stream = data[match.end():match.end() + int(match.group(1))]
+            try:
+                texts.append(zlib.decompress(stream))
+            except zlib.error:
+                pass            # font or image data
+        return texts
+
+    def testAliasBeforeFirstPageEnds(self):
+        pdf = self.newReport()
+        pdf.alias_nb_pages()
+        for i in range(3):
+            pdf.cell(0, 5, "page %d of {nb}" % (i + 1), ln=1)
+            pdf.add_page()
+        texts = self.pageTexts(pdf)
+        self.assertEqual(len(texts), 4)
+        for i in range(3):
+            self.assertIn(("page %d of 4" % (i + 1)).encode("latin1"), texts[i])
+
+    def testAliasAfterFirstPageEnds(self):
+        for workers in (1, 2):
+            pdf = self.newReport(workers)
+            pdf.add_page()
+            self.assertRaises(RuntimeError, pdf.alias_nb_pages)
+            pdf.abort()
+
+    def testAliasWhenStreaming(self):
+        pdf = FPDF()
+        pdf.set_streaming(os.path.join(self.directory, "a.pdf"))
+        self.assertRaises(RuntimeError, pdf.alias_nb_pages)
+        pdf.abort()
+
+        pdf = FPDF()
+        pdf.alias_nb_pages()
+        self.assertRaises(RuntimeError, pdf.set_streaming, os.path.join(self.directory, "b.pdf"))
+
+    def testAbortStopsCompression(self):
+        threads = threading.active_count()
+        pdf = self.newReport(4)
+        for i in range(50):
+            pdf.cell(0, 5, "line %d" % i, ln=1)
+            pdf.add_page()
+        self.assertTrue(threading.active_count() > threads)
+        pdf.abort()
+        self.assertEqual(threading.active_count(), threads)
+        pdf.abort()                     # nothing left to do
+
+    def testAbortDeletesStreamedFile(self):
+        path = os.path.join(self.directory, "streamed.pdf")
+        with open(path, "wb") as f:
+            f.write(b"earlier report")
+        pdf = FPDF()
+        pdf.set_streaming(path)
+        pdf.set_compression(1, 2)
+        pdf.add_page()
+        pdf.set_font("Arial", "", 10)
+        pdf.cell(0, 5, "text")
+        pdf.add_page()
+        pdf.abort()
+        self.assertTrue(pdf._stream_file is None)
+        self.assertEqual(os.listdir(self.directory), ["streamed.pdf"])
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"earlier report")
+
+    def testStreamedFileInPlaceWhenComplete(self):
+        path = os.path.join(self.directory, "streamed.pdf")
+        with open(path, "wb") as f:
+            f.write(b"earlier report")
+        pdf = FPDF()
+        pdf.set_streaming(path)
+        pdf.add_page()
+        pdf.set_font("Arial", "", 10)
+        pdf.cell(0, 5, "text")
+        pdf.add_page()
+        self.assertEqual(sorted(os.listdir(self.directory)), ["streamed.pdf", "streamed.pdf.part"])
+        pdf.output(path, "F")
+        self.assertEqual(os.listdir(self.directory), ["streamed.pdf"])
+        with open(path, "rb") as f:
+            data = f.read()
+        self.assertTrue(data.startswith(b"%PDF") and data.rstrip().endswith(b"%%EOF"))
+
+
+
+if __name__ == "__main__":
+    unittest.main()
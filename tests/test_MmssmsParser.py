@@ -0,0 +1,87 @@
+"""
+Tests for MmssmsParser: the single grouped scan gives the conversations the query per address gave, in the same order.
+
+    python -m unittest discover -s tests
+"""
+
+
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import SyntheticDevice
+from ConversationExtractorModule import ConversationExtractorModule
+
+
+
+class MmssmsParserTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        spec = SyntheticDevice.DeviceSpec(messages=500, addresses=40, junk_ratio=0.05, seed=5)
+        SyntheticDevice.generateDevice(cls.directory, spec)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    "Returns (address, [(type, date, body)]) per conversation, read the way MmssmsParser did before its grouped scan"
+    def perAddress(self, db_path):
+        db = sqlite3.connect(db_path)
+        try:
+            conversations = []
+            for (address,) in db.execute("SELECT DISTINCT address FROM sms").fetchall():
+                rows = db.execute("SELECT type, date, body FROM sms WHERE address = ? ORDER BY date", (address,)).fetchall()
+                if rows:
+                    conversations.append((address, [(str(t), d, b) for t, d, b in rows]))
+            return conversations
+        finally:
+            db.close()
+
+    def testSameConversationsInSameOrder(self):
+        db_path = os.path.join(self.directory, "mmssms.db")
+        module = ConversationExtractorModule()
+        msgParser = module.getParser("mmssms.db", None, self.directory)
+        parsed = []
+        for conversation in msgParser.iterParse(db_path):
+            contact = conversation.person2
+            messages = [("1" if m.sender is contact else "2", m.timestamp, m.content) for m in conversation.messages]
+            parsed.append((contact.id, messages))
+        expected = self.perAddress(db_path)
+        self.assertEqual([address for address, messages in parsed], [address for address, messages in expected])
+        self.assertEqual(parsed, expected)
+
+    def testFormsOfOneNumberAreOneConversation(self):
+        directory = tempfile.mkdtemp()
+        try:
+            db_path = os.path.join(directory, "mmssms.db")
+            db = sqlite3.connect(db_path)
+            db.execute("CREATE TABLE sms (_id INTEGER PRIMARY KEY, address TEXT, type INTEGER, date INTEGER, body TEXT)")
+            db.executemany("INSERT INTO sms (address, type, date, body) VALUES (?, ?, ?, ?)", [
+                ("+1 555-010-0000", 1, 1000, "first"),
+                ("+15559990000", 1, 1500, "other number"),
+                ("+15550100000", 2, 2000, "second"),
+                ("+1 (555) 010-0000", 1, 3000, "third"),
+                ("+1 555-010-0000", 2, 4000, "fourth"),
+            ])
+            db.commit()
+            db.close()
+            module = ConversationExtractorModule()
+            msgParser = module.getParser("mmssms.db", None, directory)
+            conversations = list(msgParser.iterParse(db_path))
+            self.assertEqual([c.person2.id for c in conversations], ["+1 555-010-0000", "+15559990000"])
+            self.assertEqual([m.content for m in conversations[0].messages], ["first", "second", "third", "fourth"])
+            contact = conversations[0].person2
+            self.assertEqual([m.sender is contact for m in conversations[0].messages], [True, False, True, False])
+        finally:
+            shutil.rmtree(directory)
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+Tests for ParseCache.prune: entries the report did not use are deleted, the rest of the directory is left alone.
+
+    python -m unittest discover -s tests
+"""
+
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from util import Contact
+from util import Conversation
+from ParseCache import ParseCache
+
+
+
+class Parser():
+    version = 1
+
+
+class ParseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cacheDir = os.path.join(self.directory, "cache")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    "Writes a database file with contents, returns its path"
+    def database(self, name, contents):
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as f:
+            f.write(contents)
+        return path
+
+    "Saves one conversation under key in cache"
+    def store(self, cache, key):
+        conversation = Conversation(Contact("1"), Contact("2"))
+        conversation.add(conversation.person1, conversation.person2, 1000, "text")
+        list(cache.store(key, (c for c in [conversation])))
+
+    def testPrune(self):
+        kept = self.database("kept.db", b"unchanged")
+        changed = self.database("changed.db", b"before")
+        cache = ParseCache(self.cacheDir)
+        oldKeys = [cache.key(Parser(), kept), cache.key(Parser(), changed)]
+        for key in oldKeys:
+            self.store(cache, key)
+        sections = os.path.join(self.cacheDir, "Sections")
+        os.makedirs(sections)
+        leftover = os.path.join(self.cacheDir, "left.part")
+        open(leftover, "wb").close()
+        os.utime(leftover, (time.time() - 60, time.time() - 60))
+
+        # next report: one database changed, the parser of the other moved on a version
+        self.database("changed.db", b"after")
+        cache = ParseCache(self.cacheDir)
+        parser = Parser()
+        parser.version = 2
+        newKeys = [cache.key(Parser(), kept), cache.key(Parser(), changed), cache.key(parser, kept)]
+        for key in newKeys[1:]:
+            self.store(cache, key)
+        writing = os.path.join(self.cacheDir, "writing.part")     # being written by a worker of this report
+        open(writing, "wb").close()
+        cache.prune()
+
+        self.assertTrue(cache.has(newKeys[0]) and newKeys[0] == oldKeys[0])
+        self.assertTrue(cache.has(newKeys[1]) and cache.has(newKeys[2]))
+        self.assertFalse(cache.has(oldKeys[1]))
+        self.assertTrue(os.path.isdir(sections))
+        self.assertFalse(os.path.exists(leftover))
+        self.assertTrue(os.path.exists(writing))
+
+
+
+if __name__ == "__main__":
+    unittest.main()
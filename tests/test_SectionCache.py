@@ -0,0 +1,118 @@
+"""
+Tests for SectionCache: sections are only replayed where they would come out the same.
+
+    python -m unittest discover -s tests
+"""
+
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fpdf.fpdf import FPDF
+from SectionCache import SectionCache
+
+
+
+class SectionCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = SectionCache(self.directory, 1)
+        self.tz = os.environ.get("TZ")
+
+    def tearDown(self):
+        if self.tz is None:
+            os.environ.pop("TZ", None)
+        else:
+            os.environ["TZ"] = self.tz
+        if hasattr(time, "tzset"):
+            time.tzset()
+        shutil.rmtree(self.directory)
+
+    "Returns a report with one page begun, in the same state every time"
+    def newReport(self):
+        pdf = FPDF()
+        pdf.add_page()
+        pdf.set_font("Arial", "", 10)
+        return pdf
+
+    "Records a section of pdf drawn from its current state, returns its key"
+    def record(self, pdf):
+        key = self.cache.key("database", pdf)
+        self.cache.begin(key, pdf)
+        for i in range(100):
+            pdf.cell(0, 5, "message %d" % i, ln=1)
+        self.cache.end(key, pdf, True)
+        return key
+
+    def setTimeZone(self, tz):
+        os.environ["TZ"] = tz
+        time.tzset()
+
+    def testReplay(self):
+        key = self.record(self.newReport())
+        pdf = self.newReport()
+        self.assertTrue(self.cache.replay(key, pdf))
+        self.assertEqual(pdf.page, 2)
+
+    @unittest.skipUnless(hasattr(time, "tzset"), "needs time.tzset")
+    def testOtherTimeZoneMisses(self):
+        self.setTimeZone("America/New_York")
+        key = self.record(self.newReport())
+        self.assertTrue(self.cache.replay(self.cache.key("database", self.newReport()), self.newReport()))
+
+        self.setTimeZone("Asia/Tokyo")
+        pdf = self.newReport()
+        otherKey = self.cache.key("database", pdf)
+        self.assertNotEqual(key, otherKey)
+        self.assertFalse(self.cache.replay(otherKey, pdf))
+        self.assertEqual(pdf.page, 1)
+
+    def testKeyIndependentOfWhatCameBefore(self):
+        keys = []
+        for before in (0, 3, 80):
+            pdf = self.newReport()
+            for font in (("Arial", "", 10), ("Arial", "B", 12), ("Arial", "I", 10)):
+                pdf.set_font(*font)             # same fonts registered, as the module does in createReport
+            pdf.set_text_color(200, 0, 0)
+            pdf.set_draw_color(0, 0, 100)
+            pdf.set_line_width(1)
+            for i in range(before):
+                pdf.multi_cell(0, 7, "line %d " % i * 20)
+            pdf.add_fresh_page()
+            keys.append(self.cache.key("database", pdf))
+            self.record(pdf)
+        self.assertEqual(len(set(keys)), 1)
+
+    def testCorruptSectionMisses(self):
+        corruptions = [
+            lambda data: data[:len(data) // 2],                     # truncated
+            lambda data: b"Sxx\n" + data,                           # bad record length
+            lambda data: data.replace(b"message 50", b"message 5"), # records no longer line up
+            lambda data: data[:data.rindex(b"\nE") + 1] + b"E2\n[]",  # bad end state
+            lambda data: b"",
+        ]
+        for corrupt in corruptions:
+            key = self.record(self.newReport())
+            path = self.cache.path(key)
+            with open(path, "rb") as f:
+                data = f.read()
+            with open(path, "wb") as f:
+                f.write(corrupt(data))
+
+            pdf = self.newReport()
+            before = list(pdf.pages[1])
+            self.assertFalse(self.cache.replay(key, pdf))
+            self.assertFalse(os.path.exists(path))          # deleted, so it is recorded again
+            self.assertEqual(pdf.page, 1)                   # and nothing was drawn
+            self.assertEqual(pdf.pages[1], before)
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the text transcripts write: conversation headers print names as they are, where the core fonts can.
+
+    python -m unittest discover -s tests
+"""
+
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fpdf.fpdf import FPDF
+from util import Contact
+from util import Conversation
+from TranscriptRenderer import RenderContext
+from ConversationExtractorModule import ConversationExtractorModule
+
+
+
+class TranscriptHeaderTest(unittest.TestCase):
+    "Returns text as the pdf takes it: text in python 3, latin-1 bytes in python 2"
+    def pdfText(self, text):
+        return text if str is not bytes else text.encode("latin-1")
+
+    def testEncodeHeader(self):
+        ctx = RenderContext(None)
+        self.assertEqual(ctx.encodeHeader(u"Jürgen"), self.pdfText(u"Jürgen"))
+        self.assertEqual(ctx.encodeHeader(u"Zoë 张"), self.pdfText(u"Zoë ?"))
+
+    def testHeaderInReport(self):
+        owner = Contact("this_device")
+        conversation = Conversation(owner, Contact("+15550100000", u"Jürgen Zoë 张"))
+        conversation.add(owner, conversation.person2, 1700000000000, u"hello")
+        pdf = FPDF()
+        pdf.set_compression(0)
+        pdf.add_page()
+        ConversationExtractorModule().convertToTranscript([conversation], "Text Messages (mmssms.db)", pdf)
+        page = "".join(pdf.pages[pdf.page])
+        if str is not bytes:
+            page = page.encode("latin-1")
+        self.assertIn(b"'J\xfcrgen Zo\xeb ?' \\(+15550100000\\)", page)
+        self.assertNotIn(b"J\xc3\xbcrgen", page)
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+Tests for util.formatTimestamp: the same dates as datetime.fromtimestamp(...).strftime, in any time zone.
+
+    python -m unittest discover -s tests
+"""
+
+
+import os
+import sys
+import time
+import random
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import util
+
+
+
+def slowFormat(timestamp):
+    return datetime.fromtimestamp(timestamp // 1000).strftime('%Y-%m-%d %H:%M:%S')
+
+
+
+@unittest.skipUnless(hasattr(time, "tzset"), "needs time.tzset")
+class FormatTimestampTest(unittest.TestCase):
+    def setUp(self):
+        self.tz = os.environ.get("TZ")
+
+    def tearDown(self):
+        if self.tz is None:
+            os.environ.pop("TZ", None)
+        else:
+            os.environ["TZ"] = self.tz
+        time.tzset()
+        util.resetTimestampFormat()
+
+    def setTimeZone(self, tz):
+        os.environ["TZ"] = tz
+        time.tzset()
+        util.resetTimestampFormat()
+
+    def assertFormatsLikeDatetime(self, timestamps):
+        for timestamp in timestamps:
+            self.assertEqual(util.formatTimestamp(timestamp), slowFormat(timestamp))
+
+    def testTimeZones(self):
+        r = random.Random(1)
+        timestamps = [r.randrange(0, 2000000000000) for i in range(2000)]
+        # every 7 minutes across the 2024 daylight saving changes in the US and Europe
+        timestamps += [(1710021600 + i * 420) * 1000 + 999 for i in range(1000)]
+        timestamps += [(1729990800 + i * 420) * 1000 for i in range(2000)]
+        for tz in ("UTC", "America/New_York", "Europe/London", "Australia/Lord_Howe", "Asia/Kolkata",
+                   "America/St_Johns", "Pacific/Chatham"):
+            self.setTimeZone(tz)
+            self.assertFormatsLikeDatetime(timestamps)
+
+    def testDaylightSavingStartingAndEndingOnOneDay(self):
+        # daylight saving from 01:00 to 20:00 on the 100th day of the year: same offset at both ends of that day
+        self.setTimeZone("XST0XDT,J100/1,J100/20")
+        start = int(time.mktime((2023, 4, 9, 0, 0, 0, 0, 0, -1)))
+        self.assertFormatsLikeDatetime((start + i * 60) * 1000 for i in range(3 * 24 * 60))
+
+    def testCachesAreBounded(self):
+        self.setTimeZone("Europe/London")
+        size = util._dayCacheSize
+        util._dayCacheSize = 50
+        try:
+            self.assertFormatsLikeDatetime(day * 86400000 + 43200000 for day in range(18000, 18400))
+            self.assertTrue(len(util._dayOffsets) <= 50 and len(util._dayPrefixes) <= 50)
+        finally:
+            util._dayCacheSize = size
+
+    def testOtherTimeZoneAfterReset(self):
+        timestamp = 1700000000000
+        self.setTimeZone("UTC")
+        self.assertEqual(util.formatTimestamp(timestamp), "2023-11-14 22:13:20")
+        self.setTimeZone("Asia/Tokyo")
+        self.assertEqual(util.formatTimestamp(timestamp), "2023-11-15 07:13:20")
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,7 +6,22 @@ April 17, 2024
 """
 
 
-class Contact():
+import os
+import re
+import time
+import threading
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+from datetime import timedelta
+
+
+# Instances are slotted (no per-instance __dict__, which needs new-style classes in Jython/Python 2): a case can
+# hold millions of messages, and a dict each would cost more than the message itself.
+
+class Contact(object):
+    __slots__ = ("id", "name")
+
     def __init__(self, id, name=None):
         self.id = id              # tne unique value (phone #, email, username, etc) that identifies this contact
         self.name = name          # the name used for the contact
@@ -30,19 +45,83 @@ class Contact():
         
 
 
-class Message():
-    def __init__(self, sender, receiver, date_sent, content):
+"""The contacts of one data source, one shared Contact per identifier (see normalizeIdentifier), so the same number or
+user found in many conversations (or databases) is one object everywhere.  get is safe to call from several threads."""
+
+class ContactRegistry(object):
+    def __init__(self):
+        self.contacts = {}              # normalized identifier -> Contact
+        self.byIdentifier = {}          # identifier as given -> Contact, so repeated lookups skip normalizing
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.contacts)
+
+    def __iter__(self):
+        return iter(list(self.contacts.values()))
+
+    """Returns the contact for id, creating it the first time (with name, or filling in its name if it had none).
+    A None id is no identifier at all, so it always gets a new Contact of its own."""
+    def get(self, id, name=None):
+        if id is None:
+            return Contact(None, name)
+        contact = self.byIdentifier.get(id)
+        if contact is None:
+            key = normalizeIdentifier(id)
+            with self.lock:
+                contact = self.contacts.get(key)
+                if contact is None:
+                    contact = Contact(id, name)
+                    self.contacts[key] = contact
+                self.byIdentifier[id] = contact
+        if name is not None and contact.name is None:
+            contact.name = name
+        return contact
+
+
+
+_phoneFormatting = re.compile(r"[\s().-]")
+_phoneNumber = re.compile(r"^\+?\d+$")
+
+"""Returns the form of a contact identifier the same contact always has: phone numbers without their formatting
+('+1 (555) 010-0000' -> '+15550100000'), anything else (user keys, emails) stripped and lower case"""
+def normalizeIdentifier(id):
+    number = _phoneFormatting.sub("", id)
+    if _phoneNumber.match(number):
+        return number
+    return id.strip().lower()
+
+
+
+class Message(object):
+    __slots__ = ("sender", "receiver", "timestamp", "content", "_date_sent")
+
+    def __init__(self, sender, receiver, date_sent, content, timestamp=None):
         self.sender = sender            # should be a Contact object
         self.receiver = receiver        # should be a Contact object
-        self.date_sent = date_sent      # expected in utc time
+        self.timestamp = timestamp      # Unix epoch in milliseconds, if known (then date_sent can be None)
+        self._date_sent = date_sent
         self.content = content
 
+    "Date the message was sent, as text (formatted from timestamp only when asked for, see formatTimestamp)"
+    @property
+    def date_sent(self):
+        if self._date_sent is None and self.timestamp is not None:
+            return formatTimestamp(self.timestamp)
+        return self._date_sent
+
+    @date_sent.setter
+    def date_sent(self, date_sent):
+        self._date_sent = date_sent
+
     def __repr__(self):# -> str:
         return "<Message [Sender: %s, Receiver: %s, Date Sent: %s, Text: %s]>" % (self.sender, self.receiver, self.date_sent, self.content)
 
 
 
-class Conversation():
+class Conversation(object):
+    __slots__ = ("person1", "person2", "messages")
+
     def __init__(self, person1, person2, messages=None):
         self.person1 = person1          # should be a Contact object
         self.person2 = person2          # should be a Contact object
@@ -57,6 +136,240 @@ class Conversation():
     def addMsg(self, msg):
         self.messages.append(msg)
 
+    "Appends a message sent at timestamp (Unix epoch in milliseconds) to the end of messages list"
+    def add(self, sender, receiver, timestamp, content):
+        self.messages.append(Message(sender, receiver, None, content, timestamp))
+
+    "Returns the number of messages in this conversation"
+    def length(self):# -> int:
+        return len(self.messages)
+
+
+
+"""Same as Conversation, but its messages are kept in columns instead of one Message object each: timestamps (Unix
+epoch in milliseconds) in an integer array, senders/receivers as small indexes into its contacts, and contents in one
+list.  messages creates Message objects only as they are looked at, while sorting, time range queries and counting
+work on the columns directly.  Like a Conversation, the participants can be filled in after messages were added (the
+Facebook parser makes them the first two senders)."""
+
+class ColumnarConversation(object):
+    __slots__ = ("contacts", "timestamps", "senders", "receivers", "contents", "ordered")
+
+    def __init__(self, person1, person2, messages=None):
+        # what senders/receivers index (found by identity, see _contactIndex), person1 and person2 always at 1 and 2
+        self.contacts = [None, person1, person2]
+        self.timestamps = _timestampArray()
+        self.senders = array("H")
+        self.receivers = array("H")
+        self.contents = []
+        self.ordered = True             # timestamps never decrease (so range queries can bisect)
+        for msg in messages or []:
+            self.addMsg(msg)
+
+    def __repr__(self):# -> str:
+        return "<ColumnarConversation [Person 1: %s, Person 2: %s, Length: %s]>" % (self.person1, self.person2, len(self.contents))
+
+    @property
+    def person1(self):                  # should be a Contact object
+        return self.contacts[1]
+
+    @person1.setter
+    def person1(self, contact):
+        self._setPerson(1, contact)
+
+    @property
+    def person2(self):                  # should be a Contact object
+        return self.contacts[2]
+
+    @person2.setter
+    def person2(self, contact):
+        self._setPerson(2, contact)
+
+    def _setPerson(self, i, contact):
+        previous = self.contacts[i]
+        if previous is contact:
+            return
+        self.contacts[i] = contact
+        if previous is not None and (i in self.senders or i in self.receivers):
+            # messages of the participant replaced keep pointing at it, under another index
+            self._remap(i, self._contactIndex(previous))
+        for j in range(3, len(self.contacts)):
+            if self.contacts[j] is contact:
+                # messages added before contact became a participant now point at it as one
+                self._remap(j, i)
+
+    def _remap(self, old, new):
+        self.senders = array("H", [new if s == old else s for s in self.senders])
+        self.receivers = array("H", [new if r == old else r for r in self.receivers])
+
+    "Sequence of the messages, each made into a Message object when it is looked at"
+    @property
+    def messages(self):
+        return _MessageColumns(self)
+
+    "Accepts a message object and appends it to the end of messages (parsing its date_sent if it has no timestamp)"
+    def addMsg(self, msg):
+        timestamp = msg.timestamp
+        if timestamp is None:
+            timestamp = parseTimestamp(msg.date_sent)
+        self.add(msg.sender, msg.receiver, timestamp, msg.content)
+
+    "Appends a message sent at timestamp (Unix epoch in milliseconds) to the end of messages"
+    def add(self, sender, receiver, timestamp, content):
+        if self.ordered and self.timestamps and timestamp < self.timestamps[-1]:
+            self.ordered = False
+        self.timestamps.append(timestamp)
+        self.senders.append(self._contactIndex(sender))
+        self.receivers.append(self._contactIndex(receiver))
+        self.contents.append(content)
+
+    def _contactIndex(self, contact):
+        # identity, like the contacts the parsers share between the messages of a conversation
+        for i, known in enumerate(self.contacts):
+            if known is contact:
+                return i
+        self.contacts.append(contact)
+        return len(self.contacts) - 1
+
     "Returns the number of messages in this conversation"
     def length(self):# -> int:
-        return len(self.messages)
\ No newline at end of file
+        return len(self.contents)
+
+    "Returns the Message at position i"
+    def message(self, i):
+        return Message(self.contacts[self.senders[i]], self.contacts[self.receivers[i]],
+                       None, self.contents[i], self.timestamps[i])
+
+    "Orders the messages by timestamp (stable, so messages sent at the same time keep their order)"
+    def sortByTime(self):
+        if self.ordered:
+            return
+        timestamps = self.timestamps
+        order = sorted(range(len(timestamps)), key=timestamps.__getitem__)
+        self.timestamps = _timestampArray(timestamps[i] for i in order)
+        self.senders = array("H", [self.senders[i] for i in order])
+        self.receivers = array("H", [self.receivers[i] for i in order])
+        self.contents = [self.contents[i] for i in order]
+        self.ordered = True
+
+    "Returns (first, last + 1) positions of the messages sent from start up to (not including) end, sorting if needed"
+    def positions(self, start, end):
+        self.sortByTime()
+        return bisect_left(self.timestamps, start), bisect_left(self.timestamps, end)
+
+    "Returns the messages sent from start up to (not including) end (Unix epoch in milliseconds)"
+    def between(self, start, end):
+        first, last = self.positions(start, end)
+        return [self.message(i) for i in range(first, last)]
+
+    "Returns the number of messages sent from start up to (not including) end (Unix epoch in milliseconds)"
+    def countBetween(self, start, end):
+        first, last = self.positions(start, end)
+        return last - first
+
+    "Returns the number of messages sent by contact"
+    def countFrom(self, contact):
+        for i, known in enumerate(self.contacts):
+            if known is contact:
+                return self.senders.count(i)
+        return 0
+
+
+
+class _MessageColumns(object):
+    __slots__ = ("conversation",)
+
+    def __init__(self, conversation):
+        self.conversation = conversation
+
+    def __len__(self):
+        return self.conversation.length()
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError("message index out of range")
+        return self.conversation.message(i)
+
+    def __iter__(self):
+        conversation = self.conversation
+        for i in range(conversation.length()):
+            yield conversation.message(i)
+
+
+
+"Returns an array of millisecond timestamps (64 bit integers where the array module has them)"
+def _timestampArray(values=()):
+    for typecode in ("q", "l"):
+        try:
+            if array(typecode).itemsize >= 8:
+                return array(typecode, values)
+        except ValueError:
+            continue
+    return array("d", values)       # exact for any millisecond timestamp up to year 285000
+
+
+"""Returns the local time zone dates are formatted in (see formatTimestamp), as a string: anything rendered with dates
+is only the same under the same time zone"""
+def localTimeZone():
+    return "%r %r %r %r %r" % (os.environ.get("TZ"), time.timezone, time.altzone, time.daylight, time.tzname)
+
+
+_dayOffsets = {}        # UTC day -> local time offset (seconds) all through it, None if it changes during the day
+_dayPrefixes = {}       # local day -> its date, formatted
+_dayCacheSize = 1 << 14         # days kept in each (45 years), both are emptied when one is full
+_offsetStep = 1800              # seconds between the times of a day its offset is checked at
+_unknown = object()
+
+"""Formats a timestamp (Unix epoch in milliseconds) the way messages show their date, in local time - the same as
+datetime.fromtimestamp(timestamp // 1000).strftime('%Y-%m-%d %H:%M:%S'), but the local time offset and the date are
+only worked out once per day, the rest is integer arithmetic.  Days the offset changes (daylight saving) take the
+slow way.  Call resetTimestampFormat when the time zone may have changed."""
+def formatTimestamp(timestamp):
+    seconds = int(timestamp // 1000)
+    day = seconds // 86400
+    offset = _dayOffsets.get(day, _unknown)
+    if offset is _unknown:
+        offset = _dayOffset(day)
+        if len(_dayOffsets) >= _dayCacheSize:
+            resetTimestampFormat()
+        _dayOffsets[day] = offset
+    if offset is None:
+        return datetime.fromtimestamp(seconds).strftime('%Y-%m-%d %H:%M:%S')
+    local = seconds + offset
+    localDay = local // 86400
+    prefix = _dayPrefixes.get(localDay)
+    if prefix is None:
+        prefix = (datetime(1970, 1, 1) + timedelta(days=localDay)).strftime('%Y-%m-%d ')
+        if len(_dayPrefixes) >= _dayCacheSize:
+            resetTimestampFormat()
+        _dayPrefixes[localDay] = prefix
+    local -= localDay * 86400
+    return "%s%02d:%02d:%02d" % (prefix, local // 3600, local // 60 % 60, local % 60)
+
+"Forgets the offsets and dates formatTimestamp worked out (for another time zone, or to free them)"
+def resetTimestampFormat():
+    _dayOffsets.clear()
+    _dayPrefixes.clear()
+
+"""Returns the offset of local time from UTC (in seconds) all through a UTC day, or None if it changes during the day.
+It is checked every _offsetStep seconds and at the last second of the day, so a change is seen even if it is undone
+the same day (offsets never change back within half an hour)."""
+def _dayOffset(day):
+    start = day * 86400
+    offset = _localOffset(start)
+    for seconds in list(range(start + _offsetStep, start + 86400, _offsetStep)) + [start + 86399]:
+        if _localOffset(seconds) != offset:
+            return None
+    return offset
+
+"Returns the offset of local time from UTC (in seconds) at the given Unix time"
+def _localOffset(seconds):
+    delta = datetime.fromtimestamp(seconds) - (datetime(1970, 1, 1) + timedelta(seconds=seconds))
+    return delta.days * 86400 + delta.seconds
+
+
+"Returns the timestamp (Unix epoch in milliseconds) of a date as formatted by formatTimestamp"
+def parseTimestamp(date_sent):
+    return int(time.mktime(datetime.strptime(date_sent, '%Y-%m-%d %H:%M:%S').timetuple())) * 1000
\ No newline at end of file